@@ -1,6 +1,7 @@
 import geopandas as gpd
 import pandas as pd
-from shapely.geometry import LineString, Point
+import numpy as np
+import shapely
 from shapely.ops import substring
 
 def snap_points_to_line(stops_gdf, routes_gdf, 
@@ -21,26 +22,24 @@ def snap_points_to_line(stops_gdf, routes_gdf,
     Returns:
         GeoDataFrame: 更新後的公車站點 GeoDataFrame，其中 geometry 已投影到路線。
     """
-    snapped_points = []
-
-    for _, stop in stops_gdf.iterrows():
-        # 找到與站點路線名稱和方向相符的路線
-        matching_route = routes_gdf[(routes_gdf[route_routename_col] == stop[seq_routename_col]) & 
-                                    (routes_gdf[route_direction_col] == stop[seq_direction_col])]
-
-        if not matching_route.empty:
-            # 取出該路線的 geometry
-            line = matching_route.iloc[0].geometry
-            # 計算站點投影到該路線的最近點
-            snapped_point = line.interpolate(line.project(stop.geometry))
-            snapped_points.append(snapped_point)
-        else:
-            # 如果沒有匹配的路線，保持原點
-            snapped_points.append(stop.geometry)
+    stops_gdf = stops_gdf.copy()
+
+    # 先建立 (路線, 方向) -> geometry 的對照表，同一組若有多條路線取第一條
+    route_lookup = routes_gdf.drop_duplicates(subset=[route_routename_col, route_direction_col], keep='first') \
+                             .set_index([route_routename_col, route_direction_col]).geometry
+    keys = pd.MultiIndex.from_arrays([stops_gdf[seq_routename_col], stops_gdf[seq_direction_col]])
+    lines = np.asarray(route_lookup.reindex(keys), dtype=object)
+    points = np.asarray(stops_gdf.geometry.values, dtype=object)
+
+    # 一次計算所有站點投影到對應路線的最近點，沒有匹配路線的站點保持原點
+    snapped_points = points.copy()
+    matched = ~shapely.is_missing(lines)
+    if matched.any():
+        snapped_points[matched] = shapely.line_interpolate_point(
+            lines[matched], shapely.line_locate_point(lines[matched], points[matched]))
 
     # 更新站點的 geometry
-    stops_gdf = stops_gdf.copy()
-    stops_gdf['geometry'] = snapped_points
+    stops_gdf['geometry'] = gpd.GeoSeries(snapped_points, index=stops_gdf.index, crs=stops_gdf.crs)
     stops_gdf[seq_lat_col] = stops_gdf.geometry.y
     stops_gdf[seq_lng_col] = stops_gdf.geometry.x
     return stops_gdf
@@ -67,62 +66,129 @@ def split_routes(busroute_select, seq_select,
         GeoDataFrame: 更新後的公車站點 GeoDataFrame，其中 geometry 已投影到路線。
     """
 
-    output = []
-
-    for _, route in busroute_select.iterrows():
-        route_name = route[route_routename_col]
-        direction = route[route_direction_col]
-        geometry = route['geometry']
-
-        # 過濾對應路線與方向的站點
-        stops = seq_select[(seq_select[seq_routename_col] == route_name) & 
-                           (seq_select[seq_direction_col] == direction)].sort_values(seq_seq_col)
-
-        # 確保站點順序對應於路線
-        stop_coords = [(row[seq_lng_col], row[seq_lat_col]) for _, row in stops.iterrows()]
-
-        for i in range(len(stop_coords) - 1):
-            start_point = Point(stop_coords[i])
-            end_point = Point(stop_coords[i + 1])
-
-            # 找到站點在路線中的比例位置
-            start_distance = geometry.project(start_point)
-            end_distance = geometry.project(end_point)
-
-            # 提取路線幾何分段
-            segment = substring(geometry, start_distance, end_distance)
-
-            output.append({
-                'RouteName': route_name,
-                'Direction': direction,
-                'StartSeq': stops.iloc[i][seq_seq_col],
-                'EndSeq': stops.iloc[i + 1][seq_seq_col],
-                'geometry': segment
-            })
-
-    return gpd.GeoDataFrame(output)
-
-def routelength(df, routecol, directioncol, startseqcol, endseqcol, lengthcol):
-    # 轉換 StartSeq 和 EndSeq 為整數
-    df[startseqcol] = df[startseqcol].astype(int)
-    df[endseqcol] = df[endseqcol].astype(int)
+    # 站序表只排序、分組一次，取得每組 (路線, 方向) 在排序後表格中的位置
+    stops = seq_select.sort_values([seq_routename_col, seq_direction_col, seq_seq_col]).reset_index(drop=True)
+    stop_groups = stops.groupby([seq_routename_col, seq_direction_col], sort=False).indices
+    seq_values = stops[seq_seq_col].to_numpy()
+    stop_x = stops[seq_lng_col].to_numpy(dtype=float)
+    stop_y = stops[seq_lat_col].to_numpy(dtype=float)
+
+    route_names = busroute_select[route_routename_col].to_numpy()
+    directions = busroute_select[route_direction_col].to_numpy()
+    geometries = busroute_select['geometry'].to_numpy()
+
+    # 先算出每條路線的分段數，預先配置輸出陣列
+    route_stops = [stop_groups.get((route_name, direction)) for route_name, direction in zip(route_names, directions)]
+    counts = np.array([max(len(idx) - 1, 0) if idx is not None else 0 for idx in route_stops], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    total = int(offsets[-1])
+
+    out_routename = np.empty(total, dtype=route_names.dtype)
+    out_direction = np.empty(total, dtype=directions.dtype)
+    out_startseq = np.empty(total, dtype=seq_values.dtype)
+    out_endseq = np.empty(total, dtype=seq_values.dtype)
+    out_geometry = np.empty(total, dtype=object)
+
+    for i, idx in enumerate(route_stops):
+        if counts[i] == 0:
+            continue
+        start, end = offsets[i], offsets[i + 1]
+        geometry = geometries[i]
+
+        # 一次計算該路線所有站點在路線上的投影距離，再依相鄰站點切出分段
+        distances = shapely.line_locate_point(geometry, shapely.points(stop_x[idx], stop_y[idx]))
+        out_geometry[start:end] = [substring(geometry, d1, d2) for d1, d2 in zip(distances[:-1], distances[1:])]
+
+        out_routename[start:end] = route_names[i]
+        out_direction[start:end] = directions[i]
+        out_startseq[start:end] = seq_values[idx[:-1]]
+        out_endseq[start:end] = seq_values[idx[1:]]
+
+    return gpd.GeoDataFrame({
+        'RouteName': out_routename,
+        'Direction': out_direction,
+        'StartSeq': out_startseq,
+        'EndSeq': out_endseq,
+        'geometry': out_geometry
+    }, geometry='geometry')
+
+def routelength(df, routecol, directioncol, startseqcol, endseqcol, lengthcol, odpairs=None, o_col='O', d_col='D'):
+    """
+    依各路線分段長度，計算同一路線任兩站序 (O < D) 之間的路線長度。
+    分段需為依站序相接、互不重疊的路段 (例如 split_routes 的輸出)，
+    每條路線只計算一次累積長度 cum，任一 OD 的長度即為 cum[D] - cum[O]。
+    Parameters:
+        df (DataFrame): 路線分段表，每列為一個 StartSeq -> EndSeq 的分段。
+        routecol (str): 路線名稱欄位名稱。
+        directioncol (str): 路線方向欄位名稱。
+        startseqcol (str): 分段起點站序欄位名稱。
+        endseqcol (str): 分段迄點站序欄位名稱。
+        lengthcol (str): 分段長度欄位名稱。
+        odpairs (DataFrame, optional): 只計算指定的 OD 組合，需含 routecol、directioncol、o_col、d_col 欄位；
+                                       預設為 None，輸出每條路線完整的上三角 OD 表。
+        o_col (str): odpairs 中起點站序欄位名稱，預設為 'O'。
+        d_col (str): odpairs 中迄點站序欄位名稱，預設為 'D'。
+    Returns:
+        DataFrame: 未指定 odpairs 時為 [routecol, directioncol, 'O', 'D', 'TotalLength'] 的 OD 長度表；
+                   指定 odpairs 時回傳 odpairs 的副本並新增 'TotalLength' 欄位，無法計算的組合為 NaN。
+    """
+    if odpairs is not None:
+        od_groups = odpairs.groupby([routecol, directioncol]).indices
+        od_o = odpairs[o_col].to_numpy().astype(int)
+        od_d = odpairs[d_col].to_numpy().astype(int)
+        total_length = np.full(len(odpairs), np.nan)
 
-    # 建立總表
-    results = []
+    routes, directions, origins, destinations, lengths = [], [], [], [], []
 
-    # 群組並計算 O 到 D 的距離
     for (route, direction), group in df.groupby([routecol, directioncol]):
-        start_points = group[startseqcol].unique()
-        end_points = group[endseqcol].unique()
+        start_seq = group[startseqcol].to_numpy().astype(int)
+        end_seq = group[endseqcol].to_numpy().astype(int)
+
+        # 依起點站序排序後建立累積長度，cum[k] 為前 k 個分段的長度總和
+        order = np.argsort(start_seq, kind='stable')
+        sorted_start = start_seq[order]
+        sorted_end = end_seq[order]
+        cum = np.concatenate([[0], np.cumsum(group[lengthcol].to_numpy()[order])])
+
+        if odpairs is None:
+            # 完整上三角 OD 表：O 取自所有起點站序、D 取自所有迄點站序
+            O = pd.unique(start_seq)
+            D = pd.unique(end_seq)
+            o_idx, d_idx = np.nonzero(O[:, None] < D[None, :])
+            O, D = O[o_idx], D[d_idx]
+        else:
+            rows = od_groups.get((route, direction))
+            if rows is None:
+                continue
+            O, D = od_o[rows], od_d[rows]
+
+        # 起點站序 >= O 且迄點站序 <= D 的分段，即為排序後的 [first, last) 區間
+        first = np.searchsorted(sorted_start, O, side='left')
+        last = np.searchsorted(sorted_end, D, side='right')
+        distance = np.where(last > first, cum[last] - cum[first], 0)
+
+        if odpairs is None:
+            routes.append(np.full(len(O), route, dtype=object))
+            directions.append(np.full(len(O), direction, dtype=object))
+            origins.append(O)
+            destinations.append(D)
+            lengths.append(distance)
+        else:
+            total_length[rows] = np.where(O < D, distance, np.nan)
 
-        for O in start_points:
-            for D in end_points:
-                if O < D:  # 確保 O < D 是正向路徑
-                    # 篩選 O 到 D 的所有分段並加總長度
-                    distance = group[(group[startseqcol] >= O) & 
-                                     (group[endseqcol] <= D)][lengthcol].sum()
-                    results.append([route, direction, O, D, distance])
+    if odpairs is not None:
+        result_df = odpairs.copy()
+        result_df['TotalLength'] = total_length
+        return result_df
 
     # 轉成 DataFrame
-    result_df = pd.DataFrame(results, columns=[routecol, directioncol, 'O', 'D', 'TotalLength'])
-    return result_df
+    if not lengths:
+        return pd.DataFrame(columns=[routecol, directioncol, 'O', 'D', 'TotalLength'])
+    result_df = pd.DataFrame({
+        routecol: np.concatenate(routes),
+        directioncol: np.concatenate(directions),
+        'O': np.concatenate(origins),
+        'D': np.concatenate(destinations),
+        'TotalLength': np.concatenate(lengths)
+    })
+    return result_df.infer_objects()
@@ -1,34 +1,60 @@
 import pandas as pd
-import geopandas as gpd
 import numpy as np
 import math
-from shapely.geometry import Point, LineString
-import osmnx as ox
-import networkx as nx
 import os 
+import re
+import time
+import pickle
+import heapq
+import weakref
+from collections import OrderedDict
 
-def dataframe_to_point(df, lon_col, lat_col, crs="EPSG:4326", target_crs="EPSG:3826"):
+# geopandas、shapely、osmnx、scipy 載入較慢，改在需要的函數內才 import，
+# 只用到 earth_dist 等輕量函數的腳本不需負擔這些套件的載入時間
+
+# OSM 路網快取資料夾，可依需求修改
+OSM_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.cache', 'THI-ProcessTool', 'osm')
+
+# osmnx 支援的路網類型
+OSM_NETWORK_TYPES = ['all', 'all_public', 'bike', 'drive', 'drive_service', 'walk']
+
+# 同一個 Python 程序中已載入的路網，key 為 (place, network_type)
+_GRAPH_CACHE = {}
+
+# 路網節點的空間索引，key 為路網物件，路網被釋放時自動移除
+_GRAPH_INDEX = weakref.WeakKeyDictionary()
+
+# 平行路徑計算時，子程序中共享的路網
+_WORKER_GRAPH = {}
+
+# 平行點位比對時，子程序中共享的面資料索引
+_WORKER_MATCHER = {}
+
+# 同一起點的迄點少於此數量時改用起迄點雙向搜尋，較多時才跑整個路網的單源 Dijkstra
+PAIR_SEARCH_MAX_TARGETS = 4
+
+def dataframe_to_point(df, lon_col, lat_col, crs="EPSG:4326", target_crs="EPSG:3826", copy=True):
     '''
     Parameters:
     df (dataframe) : 含經緯度座標欄位的dataframe
     lon_col (str) : 緯度欄位
     Lat_col (str) : 經度欄位
     crs (str) : 目前經緯度座標的座標系統，常用的為4326(WGS84)、3826(TWD97)
-    target_crs：目標轉換的座標系統
+    target_crs：目標轉換的座標系統，與 crs 相同或為 None 時不轉換
+    copy (bool) : 是否複製輸入的 dataframe，大量資料且不需保留原表時可設為 False
     '''
+    import geopandas as gpd
 
-    # from shapely.geometry import Point
-    # import pandas as pd
-    # import geopandas as gpd
-    # Create Point geometries from the longitude and latitude columns
-    geometry = [Point(xy) for xy in zip(df[lon_col], df[lat_col])]
+    # Create Point geometries from the longitude and latitude columns (一次建立所有點位)
+    geometry = gpd.points_from_xy(df[lon_col], df[lat_col])
     # Create a GeoDataFrame with the original CRS
-    gdf = gpd.GeoDataFrame(df, geometry=geometry, crs=crs)
+    gdf = gpd.GeoDataFrame(df, geometry=geometry, crs=crs, copy=copy)
     # Convert the GeoDataFrame to the target CRS
-    gdf = gdf.to_crs(epsg=target_crs.split(":")[1])
+    if target_crs is not None and target_crs != crs:
+        gdf = gdf.to_crs(epsg=target_crs.split(":")[1])
     return gdf
 
-def get_line(df, x1 = 'Lon_o', x2 = 'Lon_d', y1 = 'Lat_o', y2 = 'Lat_d'):
+def get_line(df, x1 = 'Lon_o', x2 = 'Lon_d', y1 = 'Lat_o', y2 = 'Lat_d', copy=True):
     '''
     Parameters:
     df (dataframe) : 含經緯度座標欄位的dataframe
@@ -36,18 +62,63 @@ def get_line(df, x1 = 'Lon_o', x2 = 'Lon_d', y1 = 'Lat_o', y2 = 'Lat_d'):
     y1 (str) : 起點緯度欄位
     x2 (str) : 迄點經度欄位
     y2 (str) : 迄點緯度欄位
+    copy (bool) : 是否複製輸入的 dataframe，設為 False 時會直接在 df 加上 geometry 欄位
 
     預設立場：輸出為wgs84轉換的經緯度點位
     '''
-    # from shapely.geometry import LineString
-    # import pandas as pd
-    # import geopandas as gpd
-    df['geometry'] = df.apply(lambda row: LineString([(row[x1], row[y1]), (row[x2], row[y2])]), axis=1)
+    import geopandas as gpd
+    import shapely
+    if copy:
+        df = df.copy()
+    # 起迄點座標組成 (n, 2, 2) 的陣列，一次建立所有 LineString
+    coords = np.empty((len(df), 2, 2))
+    coords[:, 0, 0] = df[x1].to_numpy(dtype=float)
+    coords[:, 0, 1] = df[y1].to_numpy(dtype=float)
+    coords[:, 1, 0] = df[x2].to_numpy(dtype=float)
+    coords[:, 1, 1] = df[y2].to_numpy(dtype=float)
+    df['geometry'] = gpd.GeoSeries(shapely.linestrings(coords), index=df.index)
     gdf = gpd.GeoDataFrame(df, geometry='geometry')
     # 設定座標系統 (假設 WGS 84 / EPSG:4326)
     gdf.set_crs(epsg=4326, inplace=True)
     return gdf
 
+def _od_place_table(o_place, d_place, o_col, d_col, o_x_col, o_y_col, d_x_col, d_y_col):
+    """由起點表與迄點表建立地點表 (同名稱取第一次出現的座標)，依名稱排序，列位置即為 PlaceID"""
+    place = pd.concat([o_place[[o_col, o_x_col, o_y_col]].rename(columns={o_col: 'PlaceName', o_x_col:'PlaceLng', o_y_col:'PlaceLat'}),
+                       d_place[[d_col, d_x_col, d_y_col]].rename(columns={d_col: 'PlaceName', d_x_col:'PlaceLng', d_y_col:'PlaceLat'})]) \
+              .drop_duplicates(subset=['PlaceName']) \
+              .sort_values('PlaceName') \
+              .reset_index(drop=True)
+    return place
+
+def _od_pair_key(place_id_o, place_id_d, n_place):
+    """將雙向 OD 的兩個 PlaceID 依小、大順序打包成一個 int64 key"""
+    place_id_o = np.asarray(place_id_o, dtype=np.int64)
+    place_id_d = np.asarray(place_id_d, dtype=np.int64)
+    return np.minimum(place_id_o, place_id_d) * n_place + np.maximum(place_id_o, place_id_d)
+
+def _od_pair_table(paircount, place, count_col, o_x_col, o_y_col, d_x_col, d_y_col):
+    """依 Pair key 拆回兩個 PlaceID，並以位置直接對應地點名稱與座標，組成合併雙向 OD 的統計表"""
+    pair = paircount.index.to_numpy(dtype=np.int64)
+    place_id1, place_id2 = pair // len(place), pair % len(place)
+    place_name = place['PlaceName'].astype(str).reset_index(drop=True)
+    place_lng = place['PlaceLng'].to_numpy()
+    place_lat = place['PlaceLat'].to_numpy()
+
+    # 以 Series 字串運算組成 PlacePair，缺值的地點名稱會保留為缺值
+    place_pair = place_name.take(place_id1).reset_index(drop=True) + '-' + place_name.take(place_id2).reset_index(drop=True)
+    countdf = pd.DataFrame({
+        'PlacePair': place_pair.to_numpy(),
+        count_col: paircount.to_numpy(),
+        o_x_col: place_lng[place_id1],
+        o_y_col: place_lat[place_id1],
+        d_x_col: place_lng[place_id2],
+        d_y_col: place_lat[place_id2]
+    })
+    # 與 groupby 相同，不保留 PlacePair 為缺值的組合
+    countdf = countdf[place_pair.notna().to_numpy()]
+    return countdf.sort_values(count_col, ascending=False).reset_index(drop=True)
+
 def get_OD_line_shp(df, o_col, d_col, o_x_col, o_y_col, d_x_col, d_y_col, count_col, date_col, how = 'countd' ,combine = True):
     '''
     Parameters:
@@ -66,13 +137,6 @@ def get_OD_line_shp(df, o_col, d_col, o_x_col, o_y_col, d_x_col, d_y_col, count_
     countgdf　(geodataframe):為WGS84的geodataframe
     '''
 
-    def get_line(df, x1 = o_x_col, x2 = d_x_col, y1 = o_y_col, y2 = d_y_col):
-        df['geometry'] = df.apply(lambda row: LineString([(row[x1], row[y1]), (row[x2], row[y2])]), axis=1)
-        gdf = gpd.GeoDataFrame(df, geometry='geometry')
-        # 設定座標系統 (假設 WGS 84 / EPSG:4326)
-        gdf.set_crs(epsg=4326, inplace=True)
-        return gdf
-
     # 1. 不合併雙向OD
     if combine == False : 
         if how != 'countd':
@@ -82,137 +146,401 @@ def get_OD_line_shp(df, o_col, d_col, o_x_col, o_y_col, d_x_col, d_y_col, count_
             countdf[count_col] = countdf[count_col] / countdf[date_col]
             countdf = countdf.drop(columns = date_col).sort_values(count_col,ascending=False).reset_index(drop = True)
     else :
-        place = pd.concat([df[[o_col, o_x_col, o_y_col]].rename(columns={o_col: 'PlaceName', o_x_col:'PlaceLng', o_y_col:'PlaceLat'}),
-                        df[[d_col, d_x_col, d_y_col]].rename(columns={d_col: 'PlaceName', d_x_col:'PlaceLng', d_y_col:'PlaceLat'})]) \
-                .drop_duplicates(subset=['PlaceName']) \
-                .sort_values('PlaceName') \
-                .reset_index(drop=True).reset_index(names='PlaceID')
-        df_copy = df.copy()
-        df_copy = pd.merge(df_copy, place.rename(columns = {'PlaceName':o_col}), on = o_col)
-        df_copy = pd.merge(df_copy, place.rename(columns = {'PlaceName':d_col}), on = d_col, suffixes=['_o','_d'])
-        df_copy['OD'] = df_copy['PlaceID_o'].astype(str) + '-' + df_copy['PlaceID_d'].astype(str)
-        df_copy
-        # 確保小的 PlaceID 放前面，大的放後面
-        df_copy['Pair'] = np.where(df_copy['PlaceID_o'] < df_copy['PlaceID_d'],
-                            df_copy['PlaceID_o'].astype(str) + '-' + df_copy['PlaceID_d'].astype(str),
-                            df_copy['PlaceID_d'].astype(str) + '-' + df_copy['PlaceID_o'].astype(str))
-        
-        df_copy['PlacePair'] = np.where(df_copy['PlaceID_o'] < df_copy['PlaceID_d'],
-                        df_copy[o_col].astype(str) + '-' + df_copy[d_col].astype(str),
-                        df_copy[d_col].astype(str) + '-' + df_copy[o_col].astype(str))
+        place = _od_place_table(df, df, o_col, d_col, o_x_col, o_y_col, d_x_col, d_y_col)
+
+        # 以整數 PlaceID 組成雙向 OD 的 Pair key (小的 PlaceID 在前)，不產生字串 key
+        place_index = pd.Index(place['PlaceName'])
+        pair = _od_pair_key(place_index.get_indexer(df[o_col]), place_index.get_indexer(df[d_col]), len(place))
 
         if how != 'countd':
-            countdf = df_copy.groupby(['PlacePair','Pair'], as_index=False).agg({count_col: 'sum'}).sort_values(count_col,ascending=False).reset_index(drop = True) # Groupby 並計算總和
-            countdf[['PlaceID1', 'PlaceID2']] = countdf['Pair'].str.split('-', expand=True).astype(int) # 拆分 'Pair' 欄位為 PlaceID1 和 PlaceID2 並轉為 int 類型
-            
-            # 準備 place 資料表的 PlaceID 對應座標，只處理一次
-            place_rename = place.rename(columns={'PlaceID': 'PlaceID1'})
-            place_rename2 = place.rename(columns={'PlaceID': 'PlaceID2'})
-
-            # 合併 PlaceID1 和 PlaceID2 的對應經緯度座標
-            countdf = countdf.merge(place_rename, on='PlaceID1')\
-                            .merge(place_rename2, on='PlaceID2', suffixes=['_o', '_d'])
-            
-            # 篩選所需欄位並重新命名
-            countdf = countdf[['PlacePair', count_col, 'PlaceLng_o', 'PlaceLat_o', 'PlaceLng_d', 'PlaceLat_d']]\
-                    .rename(columns={'PlaceLng_o': o_x_col, 
-                                        'PlaceLat_o': o_y_col, 
-                                        'PlaceLng_d': d_x_col, 
-                                        'PlaceLat_d': d_y_col})
+            paircount = pd.Series(df[count_col].to_numpy()).groupby(pair).sum() # Groupby 並計算總和
         elif how == 'countd':
-            
-            countdf = df_copy.groupby(['Pair','PlacePair'], as_index=False).agg({count_col: 'sum',date_col:'nunique'})
+            paircount = pd.DataFrame({count_col: df[count_col].to_numpy(), date_col: df[date_col].to_numpy()}) \
+                          .groupby(pair).agg({count_col: 'sum', date_col: 'nunique'})
+            paircount = paircount[count_col] / paircount[date_col]
 
-            countdf[count_col] = countdf[count_col] / countdf[date_col]
-            
-            countdf = countdf.drop(columns = date_col).sort_values(count_col,ascending=False).reset_index(drop = True)
-            # 準備 place 資料表的 PlaceID 對應座標，只處理一次
-            countdf[['PlaceID1', 'PlaceID2']] = countdf['Pair'].str.split('-', expand=True).astype(int)
-
-            place_rename = place.rename(columns={'PlaceID': 'PlaceID1'})
-            place_rename2 = place.rename(columns={'PlaceID': 'PlaceID2'})
-            # 合併 PlaceID1 和 PlaceID2 的對應經緯度座標
-            countdf = countdf.merge(place_rename, on='PlaceID1')\
-                            .merge(place_rename2, on='PlaceID2', suffixes=['_o', '_d'])
-            # 篩選所需欄位並重新命名
-            countdf = countdf[['PlacePair', count_col, 'PlaceLng_o', 'PlaceLat_o', 'PlaceLng_d', 'PlaceLat_d']]\
-                    .rename(columns={'PlaceLng_o': o_x_col, 
-                                        'PlaceLat_o': o_y_col, 
-                                        'PlaceLng_d': d_x_col, 
-                                        'PlaceLat_d': d_y_col})
-
-    countgdf = get_line(countdf)
+        countdf = _od_pair_table(paircount, place, count_col, o_x_col, o_y_col, d_x_col, d_y_col)
+
+    countgdf = get_line(countdf, x1=o_x_col, x2=d_x_col, y1=o_y_col, y2=d_y_col, copy=False)
+    return countgdf
+
+def _iter_chunks(sources, columns=None, chunksize=None, dtype=None):
+    """
+    逐一讀取資料來源 (DataFrame、csv 或 parquet 檔案路徑)，只讀取需要的欄位，有 chunksize 時分批讀取。
+    dtype 為讀取 csv 時指定的欄位型態 (同 pd.read_csv)。
+    """
+    if isinstance(sources, (pd.DataFrame, str)):
+        sources = [sources]
+
+    for source in sources:
+        if isinstance(source, pd.DataFrame):
+            source = source[columns] if columns is not None else source
+            step = chunksize or max(len(source), 1)
+            for start in range(0, len(source), step):
+                yield source.iloc[start:start + step]
+        elif str(source).endswith('.parquet'):
+            if chunksize:
+                import pyarrow.parquet as pq
+                for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+                    yield batch.to_pandas()
+            else:
+                yield pd.read_parquet(source, columns=columns)
+        elif chunksize:
+            yield from pd.read_csv(source, usecols=columns, chunksize=chunksize, dtype=dtype)
+        else:
+            yield pd.read_csv(source, usecols=columns, dtype=dtype)
+
+def get_OD_line_shp_stream(sources, o_col, d_col, o_x_col, o_y_col, d_x_col, d_y_col, count_col, date_col,
+                           how = 'countd', combine = True, chunksize = None, reduce_every = 20):
+    '''
+    get_OD_line_shp 的串流版本，逐一讀取多個檔案 (或 DataFrame) 並累積部分統計量，
+    不需要把所有資料一次讀入記憶體，最後才建立 LineString 的 geodataframe，結果與 get_OD_line_shp 相同。
+    資料分成多批時，平均值由各批的加總 / 筆數合併計算，與一次 groupby 的加總順序不同，
+    可能有浮點數誤差 (經緯度約 1e-13 以內)；只有一批時結果完全相同。
+
+    Parameters:
+    sources (list) : 資料來源，可為 csv / parquet 檔案路徑或 DataFrame 的 list (或 iterator)
+    o_col、d_col、o_x_col、o_y_col、d_x_col、d_y_col、count_col、date_col : 同 get_OD_line_shp
+    how (str) : 填入'sum'、'mean'或'countd'
+    combine (Boolean) : 同 get_OD_line_shp
+    chunksize (int) : 單一檔案分批讀取的筆數，預設為 None (整個檔案一次讀取)
+    reduce_every (int) : 每累積幾批部分統計量就合併一次，用來控制記憶體用量
+    OthersObject:
+    countgdf　(geodataframe):為WGS84的geodataframe
+    '''
+    if how not in ('sum', 'mean', 'countd'):
+        raise ValueError("串流模式的 how 只支援 'sum'、'mean' 或 'countd'")
+
+    keys = [o_col, d_col]
+    columns = list(dict.fromkeys(keys + [o_x_col, o_y_col, d_x_col, d_y_col, count_col] + ([date_col] if how == 'countd' else [])))
+
+    # 部分統計量：(起點, 迄點) 的加總與筆數，平均值最後以加總 / 筆數計算
+    sum_columns = [count_col] if combine else [count_col, o_x_col, o_y_col, d_x_col, d_y_col]
+    partials, dates, o_places, d_places = [], [], [], []
+
+    def reduce_partials():
+        partials[:] = [pd.concat(partials).groupby(level=[0, 1], dropna=False, sort=False).sum()]
+        if dates:
+            dates[:] = [pd.concat(dates).drop_duplicates()]
+        if o_places:
+            o_places[:] = [pd.concat(o_places).drop_duplicates(subset=o_col)]
+            d_places[:] = [pd.concat(d_places).drop_duplicates(subset=d_col)]
+
+    for chunk in _iter_chunks(sources, columns, chunksize):
+        grouped = chunk.groupby(keys, dropna=False, sort=False)[sum_columns]
+        partials.append(grouped.sum().join(grouped.count(), rsuffix='_n'))
+        if how == 'countd':
+            dates.append(chunk[keys + [date_col]].dropna(subset=[date_col]).drop_duplicates())
+        if combine:
+            # 依出現順序保留每個地點第一次出現的座標
+            o_places.append(chunk[[o_col, o_x_col, o_y_col]].drop_duplicates(subset=o_col))
+            d_places.append(chunk[[d_col, d_x_col, d_y_col]].drop_duplicates(subset=d_col))
+        if len(partials) >= reduce_every:
+            reduce_partials()
+
+    if not partials:
+        raise ValueError("沒有可讀取的資料")
+    reduce_partials()
+    # 依 (起點, 迄點) 排序，與 get_OD_line_shp 的 groupby 順序相同，量值相同的 OD 排序後順序也一致
+    partial = partials[0].sort_index()
+    dates = dates[0] if dates else None
+
+    # 1. 不合併雙向OD
+    if combine == False :
+        partial = partial[partial.index.get_level_values(0).notna() & partial.index.get_level_values(1).notna()]
+        countdf = pd.DataFrame({col: partial[col] / partial[f'{col}_n'] for col in [o_x_col, o_y_col, d_x_col, d_y_col]})
+        if how == 'sum':
+            countdf[count_col] = partial[count_col]
+        elif how == 'mean':
+            countdf[count_col] = partial[count_col] / partial[f'{count_col}_n']
+        elif how == 'countd':
+            ndays = dates.groupby(keys, dropna=False, sort=False).size()
+            countdf[count_col] = partial[count_col] / ndays.reindex(partial.index)
+        countdf = countdf.reset_index().sort_values(count_col,ascending=False).reset_index(drop = True)
+    else :
+        place = _od_place_table(o_places[0], d_places[0], o_col, d_col, o_x_col, o_y_col, d_x_col, d_y_col)
+        place_index = pd.Index(place['PlaceName'])
+        pair = _od_pair_key(place_index.get_indexer(partial.index.get_level_values(0)),
+                            place_index.get_indexer(partial.index.get_level_values(1)), len(place))
+        paircount = partial[count_col].groupby(pair).sum()
+
+        if how == 'countd':
+            date_pair = _od_pair_key(place_index.get_indexer(dates[o_col]), place_index.get_indexer(dates[d_col]), len(place))
+            ndays = pd.DataFrame({'Pair': date_pair, date_col: dates[date_col].to_numpy()}) \
+                      .drop_duplicates().groupby('Pair').size()
+            paircount = paircount / ndays.reindex(paircount.index)
+
+        countdf = _od_pair_table(paircount, place, count_col, o_x_col, o_y_col, d_x_col, d_y_col)
+
+    countgdf = get_line(countdf, x1=o_x_col, x2=d_x_col, y1=o_y_col, y2=d_y_col, copy=False)
     return countgdf
 
-def matchpolygon(polygon, pointlist , pointLat = 'PositionLat', pointLon = 'PositionLon'):
+class PolygonMatcher:
     '''
+    可重複使用的點位落入面 (point-in-polygon) 比對器。
+    面資料只在建立時轉為 WGS84、建立 STRtree 與 prepared geometry 一次，之後每批點位呼叫 match() 都以向量化方式比對。
+
     polygon(gdf): 面狀的shp
+    columns(list): 要帶入點位的面屬性欄位，預設為 None (全部非 geometry 欄位)
+    '''
+
+    def __init__(self, polygon, columns=None):
+        import shapely
+        if polygon.crs != 'EPSG:4326': #先轉回WGS
+            polygon = polygon.to_crs(epsg = 4326)
+        if columns is None:
+            columns = [col for col in polygon.columns if col != polygon.geometry.name]
+        elif isinstance(columns, str):
+            columns = [columns]
+
+        self.columns = list(columns)
+        self.attributes = pd.DataFrame(polygon[self.columns]).reset_index(drop=True)
+        self.geometries = np.asarray(polygon.geometry.values, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __getstate__(self):
+        import shapely
+        # prepared geometry 與 STRtree 無法直接序列化，傳給子程序時以 WKB 傳遞再重建
+        return {'columns': self.columns, 'attributes': self.attributes, 'geometries': shapely.to_wkb(self.geometries)}
+
+    def __setstate__(self, state):
+        import shapely
+        self.columns = state['columns']
+        self.attributes = state['attributes']
+        self.geometries = shapely.from_wkb(state['geometries'])
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def query(self, lon, lat):
+        '''
+        比對經緯度陣列落在哪些面，回傳 (點位位置, 面位置) 兩個陣列，依點位位置排序。
+        lon(array):經度座標(WGS84)
+        lat(array):緯度座標(WGS84)
+        '''
+        import shapely
+        points = shapely.points(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+        # 先以 STRtree 找出外框相交的候選，再以 prepared geometry 判斷是否真的相交
+        point_idx, polygon_idx = self.tree.query(points)
+        hit = shapely.intersects(self.geometries[polygon_idx], points[point_idx])
+        point_idx, polygon_idx = point_idx[hit], polygon_idx[hit]
+        order = np.lexsort((polygon_idx, point_idx))
+        return point_idx[order], polygon_idx[order]
+
+    def match(self, pointlist, pointLat = 'PositionLat', pointLon = 'PositionLon', keep_unmatched=False):
+        '''
+        pointlist(df):表格，需含有經緯度資料
+        pointLat(str):經度座標(WGS84)
+        pointLon(str):緯度座標(WGS84)
+        keep_unmatched(boolean):是否保留沒有落在任何面的點位 (面屬性欄位為空值)，預設為 False
+        回傳:點位表格加上所在面的屬性欄位，落在多個面的點位會有多列
+        '''
+        pointlist = pointlist.astype({
+            pointLon: "float",
+            pointLat: "float"
+        })
+        point_idx, polygon_idx = self.query(pointlist[pointLon].to_numpy(), pointlist[pointLat].to_numpy())
+
+        if keep_unmatched:
+            unmatched = np.setdiff1d(np.arange(len(pointlist)), point_idx)
+            point_idx = np.concatenate([point_idx, unmatched])
+            polygon_idx = np.concatenate([polygon_idx, np.full(len(unmatched), -1)])
+            order = np.argsort(point_idx, kind='stable')
+            point_idx, polygon_idx = point_idx[order], polygon_idx[order]
+
+        # 與 gpd.sjoin 相同，欄位名稱重複時加上 _left (面) / _right (點位) 後綴
+        points = pointlist.drop(columns='geometry', errors='ignore')
+        overlap = set(self.columns) & set(points.columns)
+        attributes = self.attributes.reindex(polygon_idx).rename(columns={col: f'{col}_left' for col in overlap})
+        points = points.iloc[point_idx].rename(columns={col: f'{col}_right' for col in overlap})
+
+        result = pd.concat([attributes.reset_index(drop=True), points.reset_index(drop=True)], axis=1)
+        result.index = pointlist.index[point_idx]
+        return result
+
+def matchpolygon(polygon, pointlist , pointLat = 'PositionLat', pointLon = 'PositionLon', columns = None, keep_unmatched = False):
+    '''
+    polygon(gdf or PolygonMatcher): 面狀的shp，重複比對同一份面資料時可傳入建立好的 PolygonMatcher
     pointlist(df):表格，需含有經緯度資料
     pointLat(str):經度座標(WGS84)
     pointLon(str):緯度座標(WGS84)
+    columns(list):要帶入點位的面屬性欄位，預設為 None (全部非 geometry 欄位)
+    keep_unmatched(boolean):是否保留沒有落在任何面的點位，預設為 False
+    '''
+    matcher = polygon if isinstance(polygon, PolygonMatcher) else PolygonMatcher(polygon, columns=columns)
+    return matcher.match(pointlist, pointLat=pointLat, pointLon=pointLon, keep_unmatched=keep_unmatched)
+
+def _init_match_worker(matcher):
+    """子程序初始化：每個子程序只接收並重建一次面資料索引"""
+    _WORKER_MATCHER['matcher'] = matcher
+
+def _match_worker_task(chunk, pointLat, pointLon, keep_unmatched):
+    """子程序任務：比對一批點位"""
+    return _WORKER_MATCHER['matcher'].match(chunk, pointLat=pointLat, pointLon=pointLon, keep_unmatched=keep_unmatched)
+
+def matchpolygon_chunked(polygon, source, outputpath, pointLat = 'PositionLat', pointLon = 'PositionLon', columns = None,
+                         usecols = None, chunksize = 1000000, workers = None, keep_unmatched = False, dtype = None):
+    '''
+    分批版本的 matchpolygon，用於無法一次讀入記憶體的大量點位 (例如整天的公車 GPS)。
+    點位每次只讀取 chunksize 筆，比對後立即寫入 outputpath，記憶體用量取決於 chunksize 與 workers。
+
+    polygon(gdf or PolygonMatcher): 面狀的shp，或建立好的 PolygonMatcher
+    source(str, DataFrame or list): 點位資料，可為 csv / parquet 檔案路徑、DataFrame 或其 list
+    outputpath(str): 輸出檔案路徑，副檔名為 .parquet 時輸出 parquet，其餘輸出 csv
+    pointLat(str):經度座標(WGS84)
+    pointLon(str):緯度座標(WGS84)
+    columns(list):要帶入點位的面屬性欄位，預設為 None (全部非 geometry 欄位)
+    usecols(list):點位資料要讀取的欄位，預設為 None (全部欄位)
+    chunksize(int):每批讀取的點位筆數
+    workers(int):平行比對的子程序數量，預設為 None (單一程序)
+    keep_unmatched(boolean):是否保留沒有落在任何面的點位，預設為 False
+    dtype(dict):讀取 csv 時指定的欄位型態 (同 pd.read_csv)，輸出 parquet 時各批的欄位型態需一致，
+                第一批整欄為空值、之後才有資料的欄位需在此指定型態，例如 {'Note': str}
+    回傳:輸出的總筆數
+
+    先寫入暫存檔，全部批次成功才取代 outputpath，中途失敗不會留下寫到一半的檔案。
     '''
+    matcher = polygon if isinstance(polygon, PolygonMatcher) else PolygonMatcher(polygon, columns=columns)
+    chunks = _iter_chunks(source, usecols, chunksize, dtype=dtype)
+    is_parquet = str(outputpath).endswith('.parquet')
+    temp_path = str(outputpath) + '.tmp'
+    state = {'writer': None, 'rows': 0, 'empty': None}
+
+    def write(result):
+        # 沒有比對結果的批次先不寫入，避免以空表推斷出錯誤的欄位型態
+        if len(result) == 0:
+            state['empty'] = result
+            return
+        if is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(result, preserve_index=False)
+            if state['writer'] is None:
+                state['writer'] = pq.ParquetWriter(temp_path, table.schema)
+            else:
+                try:
+                    table = table.cast(state['writer'].schema)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    raise ValueError(f"此批點位的欄位型態與第一批不同，請以 dtype 指定欄位型態：{e}") from e
+            state['writer'].write_table(table)
+        else:
+            result.to_csv(temp_path, mode='a' if state['rows'] else 'w', header=not state['rows'], index=False)
+        state['rows'] += len(result)
+
+    completed = False
+    try:
+        if workers and workers > 1:
+            from collections import deque
+            from concurrent.futures import ProcessPoolExecutor
 
-    # import pandas as pd  #表格整理
-    # import geopandas as gpd #讀取shapefile 和進行空間計算
-    # from shapely.geometry import Point #計算距離
-
-    if polygon.crs != 'EPSG:4326': #先轉回WGS
-        polygon = polygon.to_crs(epsg = 4326)
-    pointlist = pointlist.astype({
-        pointLon: "float",
-        pointLat: "float"
-    })    
-    geometry = [Point(xy) for xy in zip(pointlist[pointLon], pointlist[pointLat])]
-    pointlist = gpd.GeoDataFrame(pointlist, geometry=geometry, crs="EPSG:4326") #把點位資料轉回'wgs84' 的經緯度座標
-    pointlist = pointlist.to_crs(epsg=4326)
-    pointlist_matchpolygon = gpd.sjoin(polygon, pointlist, how="right", predicate="intersects")
-    pointlist_matchpolygon = pointlist_matchpolygon.drop(columns = ['geometry'])
-    if 'index_right' in list(pointlist_matchpolygon.columns):
-        pointlist_matchpolygon = pointlist_matchpolygon.drop(columns = 'index_right')
-    if 'index_left' in list(pointlist_matchpolygon.columns):
-        pointlist_matchpolygon = pointlist_matchpolygon.drop(columns = 'index_left')
-    pointlist_matchpolygon = pointlist_matchpolygon[~pointlist_matchpolygon['COUNTYNAME'].isna()]
-    return pointlist_matchpolygon
-
-def get_unique_item_shp(shp, columns, folder, onlyone = True, suffix = ''):
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_match_worker, initargs=(matcher,)) as executor:
+                # 同時最多只有 workers * 2 批在計算中，依讀取順序寫出
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(executor.submit(_match_worker_task, chunk, pointLat, pointLon, keep_unmatched))
+                    if len(pending) >= workers * 2:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        else:
+            for chunk in chunks:
+                write(matcher.match(chunk, pointLat=pointLat, pointLon=pointLon, keep_unmatched=keep_unmatched))
+
+        # 全部批次都沒有結果時，仍輸出只有欄位名稱的檔案
+        if state['rows'] == 0 and state['empty'] is not None:
+            if is_parquet:
+                state['empty'].to_parquet(temp_path, index=False)
+            else:
+                state['empty'].to_csv(temp_path, index=False)
+        completed = True
+    finally:
+        if state['writer'] is not None:
+            state['writer'].close()
+        if completed and os.path.exists(temp_path):
+            os.replace(temp_path, outputpath)
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    print(f"已輸出 {state['rows']} 筆至 {outputpath}")
+    return state['rows']
+
+def get_unique_item_shp(shp, columns, folder, onlyone = True, suffix = '', driver = 'shp', filename = None, workers = 4):
     '''
     shp(gdf):shp，不限制型態
     columns(str) : 參照的欄位名稱
     onlyone(boolean) : 用於判斷是否要進行選擇符合條件的shp，若更改為False，則會輸出除去符合條件的shp
     suffix(str):用於當onlyone == False時的檔案名稱後綴
+    driver(str) : 輸出格式，'shp' 每個值一個 shp 檔、'parquet' 每個值一個 GeoParquet 檔、'gpkg' 全部寫入同一個 GeoPackage 的不同圖層
+    filename(str) : driver = 'gpkg' 時的 GeoPackage 檔名，預設為 f'{columns}.gpkg'
+    workers(int) : 同時寫檔的執行緒數量 (gpkg 為單一檔案，固定依序寫入)
+    回傳:輸出的檔案路徑 list
     '''
+    if driver not in ('shp', 'parquet', 'gpkg'):
+        raise ValueError("driver 必須是 'shp', 'parquet', 或 'gpkg'")
 
-    # import os
-    # import geopandas as gpd
-    # import pandas as pd
+    # 只掃描一次欄位，取得每個值的代碼與列位置
+    codes, uniquevalue = pd.factorize(shp[columns])
+    positions = pd.Series(np.arange(len(shp))).groupby(codes).indices
 
-    uniquevalue = shp[columns].unique()
-    alllist = [selectitem for selectitem in uniquevalue]
+    def select(code):
+        if onlyone == True:
+            return shp.iloc[positions[code]]
+        return shp.iloc[np.flatnonzero(codes != code)]
 
-    if onlyone == True:
-        for selectitem in alllist :
-            filename = f'{selectitem}.shp'
-            outputpath = os.path.join(folder, filename)
-            selectshp = shp[shp[columns] == selectitem]
-            selectshp.to_file(outputpath)
-    else:
-        for selectitem in alllist :
-            filename = f'除{selectitem}之外{suffix}.shp'
-            outputpath = os.path.join(folder, filename)
-            selectshp = shp[shp[columns] != selectitem]
-            selectshp.to_file(outputpath)
+    def name(selectitem):
+        return f'{selectitem}' if onlyone == True else f'除{selectitem}之外{suffix}'
 
-def df_centroid(df):
+    if driver == 'gpkg':
+        outputpath = os.path.join(folder, filename or f'{columns}.gpkg')
+        for code, selectitem in enumerate(uniquevalue):
+            select(code).to_file(outputpath, layer=name(selectitem), driver='GPKG')
+        return [outputpath]
+
+    def write(code):
+        selectitem = uniquevalue[code]
+        if driver == 'shp':
+            outputpath = os.path.join(folder, f'{name(selectitem)}.shp')
+            select(code).to_file(outputpath)
+        else:
+            outputpath = os.path.join(folder, f'{name(selectitem)}.parquet')
+            select(code).to_parquet(outputpath)
+        return outputpath
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(write, range(len(uniquevalue))))
+
+def df_centroid(df, crs = None, representative = False, inplace = False):
     '''
     df(gdf):需要是polygon的geodataframe
+    crs(str):計算中心點使用的投影座標系統 (例如 'EPSG:3826')，計算後再轉回 df 原本的座標系統；
+             預設為 None，直接以 df 目前的座標系統計算
+    representative(boolean):是否一併輸出保證落在面內的代表點 (RepX、RepY 欄位)
+    inplace(boolean):是否直接在 df 新增欄位，預設為 False (回傳新的 geodataframe，不修改 df)
     '''
-    
-    # 計算中心點並新增至 DataFrame
-    df['centroid'] = df.geometry.centroid
-    # 如果你只想看座標的經緯度，可以這樣拆開：
-    df['Y'] = df['centroid'].y
-    df['X'] = df['centroid'].x
-    df = df.drop(columns = 'centroid')
+    import geopandas as gpd
+    import shapely
+    geometry = df.geometry
+    if crs is not None:
+        geometry = geometry.to_crs(crs)
+
+    # 一次計算所有中心點的座標陣列，不建立暫存欄位
+    geometry = np.asarray(geometry.values)
+    points = {'': shapely.centroid(geometry)}
+    if representative:
+        points['Rep'] = shapely.point_on_surface(geometry)
+
+    columns = {}
+    for prefix, point in points.items():
+        if crs is not None:
+            point = np.asarray(gpd.GeoSeries(point, crs=crs).to_crs(df.crs).values)
+        columns[f'{prefix}Y'] = shapely.get_y(point)
+        columns[f'{prefix}X'] = shapely.get_x(point)
+
+    if not inplace:
+        return df.assign(**columns)
+    for column, values in columns.items():
+        df[column] = values
     return df
 
 def earth_dist(lat1, long1, lat2, long2):
@@ -229,8 +557,618 @@ def earth_dist(lat1, long1, lat2, long2):
     d = R * c
     return d
 
+def earth_dist_array(lat1, long1, lat2, long2, R=6378145):
+    """
+    earth_dist 的向量化版本，可輸入數值、陣列或 Series，依 numpy broadcasting 計算大圓距離 (公尺)。
+
+    Args:
+        lat1, long1 (array-like): 第一組點的緯度、經度。
+        lat2, long2 (array-like): 第二組點的緯度、經度。
+        R (float, optional): 地球半徑 (公尺)，預設與 earth_dist 相同為 6378145。
+
+    Returns:
+        numpy.ndarray or Series: 距離 (公尺)，第一個輸入為 Series 且形狀相同時回傳同 index 的 Series。
+    """
+    rad = np.pi / 180
+    a1 = np.asarray(lat1, dtype=float) * rad
+    a2 = np.asarray(long1, dtype=float) * rad
+    b1 = np.asarray(lat2, dtype=float) * rad
+    b2 = np.asarray(long2, dtype=float) * rad
+    dis_lon = b2 - a2
+    dis_lat = b1 - a1
+    a = np.sin(dis_lat / 2)**2 + np.cos(a1) * np.cos(b1) * np.sin(dis_lon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    d = R * c
+    if isinstance(lat1, pd.Series) and d.shape == lat1.shape:
+        return pd.Series(d, index=lat1.index)
+    return d
+
+def earth_dist_matrix(lat1, long1, lat2=None, long2=None, block_size=1024, dtype=np.float64, R=6378145):
+    """
+    計算兩組點之間 N×M 的距離矩陣 (公尺)，逐批計算列區塊，計算過程的暫存記憶體只與 block_size × M 成正比。
+
+    Args:
+        lat1, long1 (array-like): N 個點的緯度、經度。
+        lat2, long2 (array-like, optional): M 個點的緯度、經度，預設為 None (與第一組點相同)。
+        block_size (int, optional): 每批計算的列數，預設為 1024。
+        dtype (numpy.dtype, optional): 輸出矩陣的型態，可改為 np.float32 節省一半記憶體。
+        R (float, optional): 地球半徑 (公尺)，預設為 6378145。
+
+    Returns:
+        numpy.ndarray: N×M 的距離矩陣。
+    """
+    lat1 = np.asarray(lat1, dtype=float)
+    long1 = np.asarray(long1, dtype=float)
+    lat2 = lat1 if lat2 is None else np.asarray(lat2, dtype=float)
+    long2 = long1 if long2 is None else np.asarray(long2, dtype=float)
+
+    matrix = np.empty((len(lat1), len(lat2)), dtype=dtype)
+    for start in range(0, len(lat1), block_size):
+        end = start + block_size
+        matrix[start:end] = earth_dist_array(lat1[start:end, None], long1[start:end, None],
+                                             lat2[None, :], long2[None, :], R=R)
+    return matrix
+
+def earth_dist_within(lat1, long1, lat2, long2, radius, R=6378145):
+    """
+    找出第一組點與第二組點之間，所有距離在 radius 公尺以內的點對。
+    以單位球面座標的 KD-tree 查詢，不需計算完整的距離矩陣。
+
+    Args:
+        lat1, long1 (array-like): 第一組點的緯度、經度。
+        lat2, long2 (array-like): 第二組點的緯度、經度。
+        radius (float): 搜尋半徑 (公尺)。
+        R (float, optional): 地球半徑 (公尺)，預設為 6378145。
+
+    Returns:
+        DataFrame: 'i' 為第一組點的位置，'j' 為第二組點的位置，'Distance' 為距離 (公尺)。
+    """
+    from scipy.spatial import cKDTree
+
+    lat1, long1 = np.asarray(lat1, dtype=float), np.asarray(long1, dtype=float)
+    lat2, long2 = np.asarray(lat2, dtype=float), np.asarray(long2, dtype=float)
+
+    # 大圓距離 radius 對應的單位球弦長，略為放大以免邊界上的點因浮點誤差被排除
+    chord = 2 * np.sin(min(radius / R, np.pi) / 2) * (1 + 1e-9)
+    neighbors = cKDTree(_lonlat_to_xyz(long2, lat2)).query_ball_point(_lonlat_to_xyz(long1, lat1), chord,
+                                                                       return_sorted=True)
+
+    counts = np.array([len(items) for items in neighbors], dtype=np.int64)
+    i = np.repeat(np.arange(len(lat1)), counts)
+    j = np.concatenate(neighbors).astype(np.int64) if counts.sum() else np.empty(0, dtype=np.int64)
+    distance = earth_dist_array(lat1[i], long1[i], lat2[j], long2[j], R=R)
+
+    keep = distance <= radius
+    return pd.DataFrame({'i': i[keep], 'j': j[keep], 'Distance': distance[keep]})
+
+def _graph_cache_path(place, network_type, cache_folder=None):
+    """依 place 和 network_type 組出快取檔案路徑"""
+    cache_folder = cache_folder or OSM_CACHE_FOLDER
+    safe_place = re.sub(r'[\\/:*?"<>|,\s]+', '_', place).strip('_')
+    return os.path.join(cache_folder, f'{safe_place}_{network_type}.graphml')
+
+def load_graph(place='Taiwan', network_type='drive', graphpath=None, cache_folder=None, refresh=False):
+    """
+    讀取 OSM 路網，優先使用記憶體與本機快取，沒有快取時才從 OSM 下載並存成 GraphML。
+
+    Args:
+        place (str or list of str, optional): 地名，list 會以 ', ' 合併，預設為 'Taiwan'。
+        network_type (str, optional): 路網類型，可選 {“all”, “all_public”, “bike”, “drive”, “drive_service”, “walk”}，預設為 "drive"。
+        graphpath (str, optional): 本機 GraphML 檔案路徑，有提供時直接讀取該檔案，不使用網路。
+        cache_folder (str, optional): 快取資料夾，預設為 OSM_CACHE_FOLDER。
+        refresh (bool, optional): 是否忽略既有快取重新下載，預設為 False。
+
+    Returns:
+        networkx.MultiDiGraph: OSM 路網。
+    """
+    import osmnx as ox
+    if graphpath:
+        key = (os.path.abspath(graphpath), None)
+        if refresh or key not in _GRAPH_CACHE:
+            _GRAPH_CACHE[key] = ox.load_graphml(graphpath)
+        return _GRAPH_CACHE[key]
+
+    if isinstance(place, (list, tuple)):
+        place = ', '.join(place)
+    key = (place, network_type)
+    if not refresh and key in _GRAPH_CACHE:
+        return _GRAPH_CACHE[key]
+
+    cachepath = _graph_cache_path(place, network_type, cache_folder)
+    if not refresh and os.path.exists(cachepath):
+        G = ox.load_graphml(cachepath)
+    else:
+        G = ox.graph_from_place(place, network_type=network_type)
+        os.makedirs(os.path.dirname(cachepath), exist_ok=True)
+        ox.save_graphml(G, cachepath)
+
+    _GRAPH_CACHE[key] = G
+    return G
+
+def clear_graph_cache(place=None, network_type=None, cache_folder=None, memory_only=False):
+    """
+    清除路網快取。
+
+    Args:
+        place (str or list of str, optional): 只清除指定地名的快取，預設為 None (全部清除)。
+        network_type (str, optional): 只清除指定路網類型的快取，預設為 None (全部清除)。
+        cache_folder (str, optional): 快取資料夾，預設為 OSM_CACHE_FOLDER。
+        memory_only (bool, optional): 若為 True 只清除記憶體中的快取，保留本機檔案。
+
+    Returns:
+        list: 被刪除的快取檔案路徑。
+    """
+    if isinstance(place, (list, tuple)):
+        place = ', '.join(place)
+
+    for key in list(_GRAPH_CACHE):
+        cached_place, cached_type = key
+        if (place is None or cached_place == place) and (network_type is None or cached_type == network_type):
+            del _GRAPH_CACHE[key]
+
+    removed = []
+    if memory_only:
+        return removed
+
+    cache_folder = cache_folder or OSM_CACHE_FOLDER
+    if place is not None:
+        network_types = [network_type] if network_type else OSM_NETWORK_TYPES
+        cachefiles = [_graph_cache_path(place, t, cache_folder) for t in network_types]
+    elif os.path.isdir(cache_folder):
+        suffix = f'_{network_type}.graphml' if network_type else '.graphml'
+        cachefiles = [os.path.join(cache_folder, file) for file in os.listdir(cache_folder) if file.endswith(suffix)]
+    else:
+        cachefiles = []
+
+    for file in cachefiles:
+        if os.path.exists(file):
+            os.remove(file)
+            removed.append(file)
+    return removed
+
+def _lonlat_to_xyz(lon, lat):
+    """經緯度轉為單位球面上的三維座標，弦長與大圓距離單調對應，可直接以 KD-tree 找最近點"""
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+def get_graph_index(G):
+    """
+    取得路網節點的空間索引，同一個路網只建立一次並重複使用。
+
+    Args:
+        G (networkx.MultiDiGraph): OSM 路網。
+
+    Returns:
+        dict: 'nodes' 為節點 ID 陣列，'x'、'y' 為節點座標陣列，'tree' 為節點座標的 KD-tree。
+    """
+    import osmnx as ox
+    index = _GRAPH_INDEX.get(G)
+    if index is not None and len(index['nodes']) == G.number_of_nodes():
+        return index
+
+    from scipy.spatial import cKDTree
+
+    node_data = list(G.nodes(data=True))
+    nodes = np.empty(len(node_data), dtype=object)
+    nodes[:] = [node for node, _ in node_data]
+    x = np.array([data['x'] for _, data in node_data], dtype=float)
+    y = np.array([data['y'] for _, data in node_data], dtype=float)
+
+    # 未投影的路網在單位球面上建立索引，已投影的路網直接使用平面座標
+    projected = ox.projection.is_projected(G.graph.get('crs', 'EPSG:4326'))
+    points = np.column_stack([x, y]) if projected else _lonlat_to_xyz(x, y)
+
+    index = {'nodes': nodes, 'x': x, 'y': y, 'projected': projected, 'tree': cKDTree(points)}
+    _GRAPH_INDEX[G] = index
+    return index
+
+def _nearest_node_index(G, X, Y):
+    """一次查詢所有座標的最近節點，回傳節點在 get_graph_index(G)['nodes'] 中的位置，座標無效時為 -1"""
+    index = get_graph_index(G)
+    X = np.asarray(X, dtype=float).ravel()
+    Y = np.asarray(Y, dtype=float).ravel()
+    positions = np.full(len(X), -1, dtype=np.int64)
+
+    valid = np.isfinite(X) & np.isfinite(Y)
+    if valid.any():
+        points = np.column_stack([X[valid], Y[valid]]) if index['projected'] else _lonlat_to_xyz(X[valid], Y[valid])
+        _, positions[valid] = index['tree'].query(points)
+    return positions
+
+def _node_positions(G, node_ids):
+    """將節點 ID 轉為節點在 get_graph_index(G)['nodes'] 中的位置，不存在的節點為 -1"""
+    index = get_graph_index(G)
+    if 'node_index' not in index:
+        index['node_index'] = pd.Index(index['nodes'])
+    return index['node_index'].get_indexer(list(node_ids))
+
+def _graph_fingerprint(G):
+    """路網指紋 (節點數、路段數、節點座標範圍)，用來判斷存檔的路段快取是否屬於同一份路網"""
+    index = get_graph_index(G)
+    if 'fingerprint' not in index:
+        x, y = index['x'], index['y']
+        bbox = (float(x.min()), float(y.min()), float(x.max()), float(y.max())) if len(x) else None
+        index['fingerprint'] = (len(index['nodes']), G.number_of_edges(), bbox)
+    return index['fingerprint']
+
+def nearest_nodes(G, X, Y):
+    """
+    以路網的 KD-tree 一次找出多個座標的最近節點，取代逐筆呼叫 ox.nearest_nodes。
+
+    Args:
+        G (networkx.MultiDiGraph): OSM 路網。
+        X (array-like): 經度 (或投影座標 X)。
+        Y (array-like): 緯度 (或投影座標 Y)。
+
+    Returns:
+        numpy.ndarray: 各座標最近的節點 ID，座標無效時為 None。
+    """
+    positions = _nearest_node_index(G, X, Y)
+    nodes = get_graph_index(G)['nodes'][positions]
+    nodes[positions < 0] = None
+    return nodes
+
+def _graph_csr(G, weight='length'):
+    """將路網轉為以節點位置為索引的 CSR 稀疏矩陣，平行邊只保留最小權重，同一路網與權重只建立一次"""
+    index = get_graph_index(G)
+    key = ('csr', weight)
+    if key in index:
+        return index[key]
+
+    from scipy.sparse import csr_matrix
+
+    edge_list = list(G.edges(data=weight, default=1))
+    u = _node_positions(G, [a for a, _, _ in edge_list]).astype(np.int64)
+    v = _node_positions(G, [b for _, b, _ in edge_list]).astype(np.int64)
+    w = np.array([float(value) for _, _, value in edge_list], dtype=float)
+
+    # 平行邊 (同一組 u, v) 只保留權重最小的一條
+    order = np.lexsort((w, v, u))
+    u, v, w = u[order], v[order], w[order]
+    keep = np.ones(len(u), dtype=bool)
+    keep[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+
+    # scipy 的稀疏圖會把權重為 0 的邊視為不存在，以極小值代替
+    n = len(index['nodes'])
+    csr = csr_matrix((np.maximum(w[keep], 1e-9), (u[keep], v[keep])), shape=(n, n))
+    index[key] = csr
+    return csr
+
+def _pair_adjacency(csr, directed, cache=None):
+    """
+    將 CSR 路網轉為雙向搜尋用的 (順向, 逆向) 鄰接串列。
+    鄰接串列為 (indptr, indices, data) 的 Python list，逐節點展開時比存取 numpy 陣列快。
+    cache 為與 csr 同時存在的 dict (路網索引或子程序的共享路網)，有提供時每個路網矩陣只建立一次。
+    """
+    key = ('pair_adjacency', id(csr))
+    if cache is not None and key in cache:
+        return cache[key]
+
+    from scipy.sparse import csr_matrix
+
+    def to_lists(matrix):
+        return matrix.indptr.tolist(), matrix.indices.tolist(), matrix.data.tolist()
+
+    reverse = csr.T.tocsr()
+    if directed:
+        adjacency = (to_lists(csr), to_lists(reverse))
+    else:
+        # 無向圖兩個方向都可通行，與 scipy 相同取兩方向中較小的權重
+        coo = csr.tocoo()
+        rcoo = reverse.tocoo()
+        u = np.r_[coo.row, rcoo.row]
+        v = np.r_[coo.col, rcoo.col]
+        w = np.r_[coo.data, rcoo.data]
+        order = np.lexsort((w, v, u))
+        u, v, w = u[order], v[order], w[order]
+        keep = np.ones(len(u), dtype=bool)
+        keep[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        both = to_lists(csr_matrix((w[keep], (u[keep], v[keep])), shape=csr.shape))
+        adjacency = (both, both)
+    if cache is not None:
+        cache[key] = adjacency
+    return adjacency
+
+def _pair_path(adjacency, source, target):
+    """
+    以雙向 Dijkstra 計算單一起迄點的最短路徑，兩端搜尋相遇即停止，不需走遍整個路網。
+
+    Returns:
+        tuple: (路網距離，無法到達為 inf；路徑節點位置陣列，無法到達為 None)。
+    """
+    if source == target:
+        return 0.0, np.array([source])
+
+    settled = ({}, {})
+    seen = ({source: 0.0}, {target: 0.0})
+    preds = ({source: -1}, {target: -1})
+    fringe = ([(0.0, source)], [(0.0, target)])
+    best, meet = np.inf, -1
+    side = 1
+    while fringe[0] and fringe[1]:
+        # 順向與逆向輪流展開
+        side = 1 - side
+        dist, node = heapq.heappop(fringe[side])
+        if node in settled[side]:
+            continue
+        settled[side][node] = dist
+        if node in settled[1 - side]:
+            break
+
+        indptr, indices, data = adjacency[side]
+        for k in range(indptr[node], indptr[node + 1]):
+            neighbor = indices[k]
+            if neighbor in settled[side]:
+                continue
+            new_dist = dist + data[k]
+            if new_dist < seen[side].get(neighbor, np.inf):
+                seen[side][neighbor] = new_dist
+                preds[side][neighbor] = node
+                heapq.heappush(fringe[side], (new_dist, neighbor))
+                if neighbor in seen[1 - side]:
+                    total = new_dist + seen[1 - side][neighbor]
+                    if total < best:
+                        best, meet = total, neighbor
+
+    if meet < 0:
+        return np.inf, None
+
+    # 由相遇點分別往起點、迄點回溯
+    path = []
+    node = meet
+    while node != -1:
+        path.append(node)
+        node = preds[0][node]
+    path.reverse()
+    node = preds[1][meet]
+    while node != -1:
+        path.append(node)
+        node = preds[1][node]
+    return best, np.array(path)
+
+def _route_batch(csr, directed, orig, dest, distance_only=False, cache=None):
+    """
+    依起點分組批次計算最短路徑。迄點較多的起點只跑一次單源 Dijkstra，再從前驅節點樹取出各迄點的路徑；
+    迄點少於 PAIR_SEARCH_MAX_TARGETS 的起點 (一般 OD 表與公車路段多為此情況) 改以雙向搜尋逐對計算，
+    避免每一列都走遍整個路網。
+
+    Args:
+        csr (scipy.sparse.csr_matrix): _graph_csr 建立的路網矩陣。
+        directed (bool): 路網是否為有向圖。
+        orig (numpy.ndarray): 各列起點的節點位置，無效時為 -1。
+        dest (numpy.ndarray): 各列迄點的節點位置，無效時為 -1。
+        distance_only (bool, optional): 只計算路網距離，不取出路徑。
+        cache (dict, optional): 存放雙向搜尋鄰接串列的 dict，見 _pair_adjacency。
+
+    Returns:
+        tuple: (各列的路網距離陣列，無法到達為 inf；各列的路徑節點位置陣列 list，無法到達為 None)。
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    distances = np.full(len(orig), np.inf)
+    paths = [None] * len(orig)
+
+    rows = np.flatnonzero((orig >= 0) & (dest >= 0))
+    if len(rows) == 0:
+        return distances, paths
+
+    # 依起點排序後切成各起點的群組
+    rows = rows[np.argsort(orig[rows], kind='stable')]
+    breaks = np.flatnonzero(orig[rows][1:] != orig[rows][:-1]) + 1
+
+    for group in np.split(rows, breaks):
+        source = orig[group[0]]
+        if len(group) < PAIR_SEARCH_MAX_TARGETS:
+            adjacency = _pair_adjacency(csr, directed, cache)
+            for row in group:
+                distances[row], path = _pair_path(adjacency, source, dest[row])
+                if not distance_only:
+                    paths[row] = path
+            continue
+
+        if distance_only:
+            dist = dijkstra(csr, directed=directed, indices=source)
+            distances[group] = dist[dest[group]]
+            continue
+
+        dist, predecessors = dijkstra(csr, directed=directed, indices=source, return_predecessors=True)
+        distances[group] = dist[dest[group]]
+        for row in group:
+            node = dest[row]
+            if np.isinf(dist[node]):
+                continue
+            path = [node]
+            while node != source:
+                node = predecessors[node]
+                path.append(node)
+            paths[row] = np.array(path[::-1])
+
+    return distances, paths
+
+def _share_csr(csr):
+    """將 CSR 路網陣列複製到共享記憶體，讓子程序直接讀取，不必每個任務重新 pickle 路網"""
+    from multiprocessing import shared_memory
+
+    blocks, spec = [], {'shape': csr.shape}
+    for name in ('data', 'indices', 'indptr'):
+        array = getattr(csr, name)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+        blocks.append(shm)
+        spec[name] = (shm.name, array.shape, array.dtype.str)
+    return blocks, spec
+
+def _init_route_worker(spec, directed):
+    """子程序初始化：連結共享記憶體中的路網陣列並組回 CSR 矩陣 (不複製資料)"""
+    from multiprocessing import shared_memory
+    from scipy.sparse import csr_matrix
+
+    blocks, arrays = [], {}
+    for name in ('data', 'indices', 'indptr'):
+        shm_name, shape, dtype = spec[name]
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    _WORKER_GRAPH['csr'] = csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                      shape=spec['shape'], copy=False)
+    _WORKER_GRAPH['directed'] = directed
+    _WORKER_GRAPH['blocks'] = blocks  # 保留參照，避免共享記憶體在子程序中被關閉
+
+def _route_worker_task(orig, dest, distance_only):
+    """子程序任務：計算一批起迄點的最短路徑，並回傳子程序 ID 與耗時"""
+    start = time.perf_counter()
+    # 雙向搜尋的鄰接串列存在 _WORKER_GRAPH，每個子程序只建立一次，之後的批次直接沿用
+    distances, paths = _route_batch(_WORKER_GRAPH['csr'], _WORKER_GRAPH['directed'], orig, dest,
+                                    distance_only=distance_only, cache=_WORKER_GRAPH)
+    return distances, paths, os.getpid(), time.perf_counter() - start
+
+def _route_pairs(G, orig, dest, weight='length', distance_only=False, workers=None):
+    """
+    計算多組起迄節點的最短路徑，workers 大於 1 時以多個子程序平行計算。
+
+    Args:
+        G (networkx.MultiDiGraph): OSM 路網。
+        orig (numpy.ndarray): 各列起點的節點位置，無效時為 -1。
+        dest (numpy.ndarray): 各列迄點的節點位置，無效時為 -1。
+        weight (str, optional): 最短路徑的權重欄位，預設為 'length'。
+        distance_only (bool, optional): 只計算路網距離，不取出路徑。
+        workers (int, optional): 子程序數量，預設為 None (單一程序)。
+
+    Returns:
+        tuple: (各列的路網距離陣列、各列的路徑節點位置 list、各子程序耗時的 DataFrame，單一程序時為 None)。
+    """
+    csr = _graph_csr(G, weight)
+    if not workers or workers <= 1 or len(orig) == 0:
+        distances, paths = _route_batch(csr, G.is_directed(), orig, dest, distance_only=distance_only,
+                                        cache=get_graph_index(G))
+        return distances, paths, None
+
+    # 依起點排序並以起點群組為單位切塊，同一起點只會在一個子程序中計算
+    order = np.argsort(orig, kind='stable')
+    group_starts = np.flatnonzero(np.r_[True, orig[order][1:] != orig[order][:-1]])
+    n_chunks = min(len(group_starts), workers * 4)
+    cut = group_starts[np.linspace(0, len(group_starts), n_chunks, endpoint=False).astype(int)][1:]
+    chunks = np.split(order, cut)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    distances = np.full(len(orig), np.inf)
+    paths = [None] * len(orig)
+    timing = {}
+
+    blocks, spec = _share_csr(csr)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_route_worker,
+                                 initargs=(spec, G.is_directed())) as executor:
+            futures = [executor.submit(_route_worker_task, orig[chunk], dest[chunk], distance_only) for chunk in chunks]
+
+            # 依輸入順序放回結果，確保輸出與單一程序相同
+            for chunk, future in zip(chunks, futures):
+                try:
+                    chunk_distances, chunk_paths, pid, elapsed = future.result()
+                except Exception as e:
+                    print(f"無法計算路線：{e}")
+                    continue
+                distances[chunk] = chunk_distances
+                for row, path in zip(chunk, chunk_paths):
+                    paths[row] = path
+
+                record = timing.setdefault(pid, {'Worker': pid, 'Chunks': 0, 'Rows': 0, 'Seconds': 0.0})
+                record['Chunks'] += 1
+                record['Rows'] += len(chunk)
+                record['Seconds'] += elapsed
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    timing = pd.DataFrame(list(timing.values()), columns=['Worker', 'Chunks', 'Rows', 'Seconds'])
+    for record in timing.itertuples(index=False):
+        print(f"子程序 {record.Worker}：{record.Chunks} 批、{record.Rows} 筆，耗時 {record.Seconds:.2f} 秒")
+    return distances, paths, timing
+
+class PathMemo:
+    """
+    路段最短路徑的 LRU 快取，key 為 (start_node, end_node, weight)，值為路徑節點 ID 的 tuple (無法到達為 None)。
+    可在多次呼叫 generate_busroutewithseq 之間共用，也可存成檔案供下次執行讀取。
+    存檔時一併記錄路網指紋，之後用於不同的路網 (例如 refresh=True 重新下載) 時會自動清空快取。
+
+    Args:
+        maxsize (int, optional): 最多保留的路段數，預設為 100000。
+        path (str, optional): 快取檔案路徑，檔案存在時會先讀取。
+
+    Attributes:
+        hits (int): 命中快取的路段數。
+        misses (int): 未命中、需重新計算的路段數。
+        graph (tuple): 快取對應的路網指紋，尚未對應任何路網時為 None。
+    """
+
+    def __init__(self, maxsize=100000, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.graph = None
+        self._cache = OrderedDict()
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            self.graph = data['graph']
+            self._cache.update(data['items'])
+            self._evict()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def get(self, key):
+        """取得路段路徑並更新使用順序，沒有快取時回傳 None"""
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, path):
+        """存入路段路徑，超過 maxsize 時移除最久未使用的路段"""
+        self._cache[key] = path
+        self._cache.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def check_graph(self, graph):
+        """確認快取對應的路網指紋，與 graph 不同時清空快取，避免沿用其他路網的節點路徑"""
+        if self.graph is not None and self.graph != graph and self._cache:
+            print("路段快取與目前的路網不同，已清空快取")
+            self._cache.clear()
+        self.graph = graph
+
+    def save(self, path=None):
+        """將快取存成檔案，預設存回建立時的 path"""
+        path = path or self.path
+        if not path:
+            raise ValueError("請提供快取檔案路徑")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump({'graph': self.graph, 'items': list(self._cache.items())}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def info(self):
+        """回傳快取的命中統計"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache), 'maxsize': self.maxsize}
+
 def generate_route(df=None, coords=None, startpoint_x='Start_X', startpoint_y='Start_Y', 
-                   endpoint_x='End_X', endpoint_y='End_Y',network_type='drive' ,Citylist=None):
+                   endpoint_x='End_X', endpoint_y='End_Y',network_type='drive' ,Citylist=None,
+                   G=None, graphpath=None, refresh=False, weight='length', distance_only=False,
+                   workers=None):
     """
     根據 DataFrame 或座標列表生成路線的 GeoDataFrame。
     
@@ -243,66 +1181,83 @@ def generate_route(df=None, coords=None, startpoint_x='Start_X', startpoint_y='S
         endpoint_x (str, optional): DataFrame 中終點經度的欄位名稱，預設為 'End_X'。
         endpoint_y (str, optional): DataFrame 中終點緯度的欄位名稱，預設為 'End_Y'。
         network_type (str, optional): 路網類型，可選 {“all”, “all_public”, “bike”, “drive”, “drive_service”, “walk”}，預設為 "drive"。
+        G (networkx.MultiDiGraph, optional): 已載入的路網，有提供時不再讀取路網。
+        graphpath (str, optional): 本機 GraphML 路網檔案路徑，有提供時直接讀取，不需網路。
+        refresh (bool, optional): 是否忽略路網快取重新下載，預設為 False。
+        weight (str, optional): 最短路徑的權重欄位，預設為 'length'。
+        distance_only (bool, optional): 只計算路網距離 (例如產生旅行成本矩陣)，不產生路線 geometry，預設為 False。
+        workers (int, optional): 平行計算的子程序數量，路網以共享記憶體提供給子程序，預設為 None (單一程序)。
+                                 各子程序耗時會印出，並存於輸出的 attrs['worker_timing']。
     
     Returns:
-        GeoDataFrame: 包含路線的 geometry 欄位。
+        GeoDataFrame: 包含路線的 geometry 欄位；distance_only=True 時為含 'Distance' 欄位的 DataFrame，無法到達為 NaN。
     """
+    import geopandas as gpd
+    from shapely.geometry import LineString
     # 如果沒有指定城市，預設使用 Taiwan 的路網
     if not Citylist:
         Citylist = ['Taiwan']
     
-    # 合併城市名稱並下載 OSM 路網資料
+    # 合併城市名稱並讀取 OSM 路網資料 (優先使用快取)
     place_name = ', '.join(Citylist)
-    try:
-        G = ox.graph_from_place(place_name, network_type=network_type)
-    except Exception as e:
-        print(f"無法下載路網資料：{e}")
-        return None
-    
-    routes = []
+    if G is None:
+        try:
+            G = load_graph(place_name, network_type=network_type, graphpath=graphpath, refresh=refresh)
+        except Exception as e:
+            print(f"無法下載路網資料：{e}")
+            return None
     
     # 如果使用 DataFrame
     if df is not None:
-        for _, row in df.iterrows():
-            try:
-                orig_node = ox.nearest_nodes(G, X=row[startpoint_x], Y=row[startpoint_y])
-                dest_node = ox.nearest_nodes(G, X=row[endpoint_x], Y=row[endpoint_y])
-                
-                # 計算最短路徑
-                route = nx.shortest_path(G, orig_node, dest_node, weight='length')
-                route_coords = [(G.nodes[node]['x'], G.nodes[node]['y']) for node in route]
-                
-                routes.append(LineString(route_coords))
-            except Exception as e:
-                print(f"無法計算路線：{e}")
-                routes.append(None)
-        gdf = gpd.GeoDataFrame(df.copy(), geometry=routes, crs='EPSG:4326')
+        start_x, start_y = df[startpoint_x].to_numpy(dtype=float), df[startpoint_y].to_numpy(dtype=float)
+        end_x, end_y = df[endpoint_x].to_numpy(dtype=float), df[endpoint_y].to_numpy(dtype=float)
     
     # 如果使用座標列表
     elif coords:
-        for start_x, start_y, end_x, end_y in coords:
-            try:
-                orig_node = ox.nearest_nodes(G, X=start_x, Y=start_y)
-                dest_node = ox.nearest_nodes(G, X=end_x, Y=end_y)
-                
-                route = nx.shortest_path(G, orig_node, dest_node, weight='length')
-                route_coords = [(G.nodes[node]['x'], G.nodes[node]['y']) for node in route]
-                
-                routes.append(LineString(route_coords))
-            except Exception as e:
-                print(f"無法計算路線：{e}")
-                routes.append(None)
-        gdf = gpd.GeoDataFrame({'geometry': routes}, crs='EPSG:4326')
+        start_x, start_y, end_x, end_y = np.asarray(coords, dtype=float).reshape(-1, 4).T
     
     else:
         print("請提供 DataFrame 或座標列表")
         return None
     
+    # 一次找出所有起迄點的最近節點
+    index = get_graph_index(G)
+    orig_nodes = _nearest_node_index(G, start_x, start_y)
+    dest_nodes = _nearest_node_index(G, end_x, end_y)
+    
+    # 依起點分組批次計算最短路徑
+    distances, paths, timing = _route_pairs(G, orig_nodes, dest_nodes, weight=weight,
+                                            distance_only=distance_only, workers=workers)
+    
+    if distance_only:
+        gdf = df.copy() if df is not None else pd.DataFrame(index=range(len(distances)))
+        gdf['Distance'] = np.where(np.isinf(distances), np.nan, distances)
+        if timing is not None:
+            gdf.attrs['worker_timing'] = timing
+        return gdf
+    
+    routes = []
+    for path in paths:
+        try:
+            if path is None:
+                raise ValueError("起迄點之間沒有可到達的路徑")
+            routes.append(LineString(np.column_stack([index['x'][path], index['y'][path]])))
+        except Exception as e:
+            print(f"無法計算路線：{e}")
+            routes.append(None)
+    
+    if df is not None:
+        gdf = gpd.GeoDataFrame(df.copy(), geometry=routes, crs='EPSG:4326')
+    else:
+        gdf = gpd.GeoDataFrame({'geometry': routes}, crs='EPSG:4326')
+    if timing is not None:
+        gdf.attrs['worker_timing'] = timing
+    
     return gdf
 
 
-def generate_busroutewithseq(df, idcolumns, seqcolumns, xcolumns, ycolumns, location, direction_column=None):
-
+def generate_busroutewithseq(df, idcolumns, seqcolumns, xcolumns, ycolumns, location, direction_column=None,
+                             G=None, graphpath=None, refresh=False, weight='length', workers=None, memo=None):
     """
     根據 DataFrame 或座標列表生成路線的 GeoDataFrame。
     
@@ -314,16 +1269,30 @@ def generate_busroutewithseq(df, idcolumns, seqcolumns, xcolumns, ycolumns, loca
         ycolumns(float) : 緯度。
         location(str) : 城市。
         direction_column(str) : 方向。
+        G (networkx.MultiDiGraph, optional): 已載入的路網，有提供時不再讀取路網。
+        graphpath (str, optional): 本機 GraphML 路網檔案路徑，有提供時直接讀取，不需網路。
+        refresh (bool, optional): 是否忽略路網快取重新下載，預設為 False。
+        weight (str, optional): 最短路徑的權重欄位，預設為 'length'。
+        workers (int, optional): 平行計算的子程序數量，預設為 None (單一程序)。
+        memo (PathMemo or str, optional): 路段最短路徑快取，相同的站點路段只計算一次。
+                                          可傳入 PathMemo 跨呼叫共用；傳入檔案路徑則讀取並在結束時存回該檔案；
+                                          預設為 None，僅在本次呼叫中共用。命中統計存於輸出的 attrs['memo_info']。
     
     Returns:
-        GeoDataFrame: 包含路線的 geometry 欄位。
+        GeoDataFrame: 包含路線的 geometry 欄位，有路段無法計算的路線為 None。
     """
+    import geopandas as gpd
+    from shapely.geometry import LineString
     
-    # 下載指定位置的 OSM 道路網絡
-    G = ox.graph_from_place(location, network_type='drive')
+    # 讀取指定位置的 OSM 道路網絡 (優先使用快取)
+    if G is None:
+        G = load_graph(location, network_type='drive', graphpath=graphpath, refresh=refresh)
     
-    routes = []
     route_ids = []  # 用來存儲每條路線的 RouteID
+    route_legs = []  # 每條路線的路段在所有路段中的範圍
+    
+    # 一次找出所有站點的最近節點
+    df = df.assign(_StopNode=_nearest_node_index(G, df[xcolumns], df[ycolumns]))
     
     # 如果有 Direction 欄位，先按 RouteID 和 Direction 分組
     if direction_column and direction_column in df.columns:
@@ -331,45 +1300,202 @@ def generate_busroutewithseq(df, idcolumns, seqcolumns, xcolumns, ycolumns, loca
     else:
         groups = df.groupby([idcolumns])  # 否則只根據 RouteID 分組
     
+    # 收集所有路線相鄰站點的路段，再一起計算最短路徑
+    leg_orig, leg_dest = [], []
+    n_legs = 0
     for (route_id, *direction), route_df in groups:
         # 如果有 Direction 欄位，確保按 Seq 排序
-        route_df = route_df.sort_values(by=seqcolumns)
-        coords = list(zip(route_df[xcolumns], route_df[ycolumns]))
-        
-        route_lines = []
-        
-        for i in range(len(coords) - 1):
-            start_point = coords[i]
-            end_point = coords[i + 1]
-            
-            # 轉換成節點 (nearest node) 使用 osmnx 直接找到最近的節點
-            start_node = ox.nearest_nodes(G, X=start_point[0], Y=start_point[1])
-            end_node = ox.nearest_nodes(G, X=end_point[0], Y=end_point[1])
-            
-            # 計算最短路徑
-            route = nx.shortest_path(G, source=start_node, target=end_node, weight='length')
-            
-            # 獲取路徑的坐標
-            route_coords = [(G.nodes[node]['x'], G.nodes[node]['y']) for node in route]
-            route_lines.append(route_coords)
+        route_nodes = route_df.sort_values(by=seqcolumns)['_StopNode'].to_numpy()
+        leg_orig.append(route_nodes[:-1])
+        leg_dest.append(route_nodes[1:])
+        route_legs.append((n_legs, n_legs + len(route_nodes) - 1))
+        n_legs += len(route_nodes) - 1
+        route_ids.append(route_id)  # 記錄該路線的 RouteID
+    
+    leg_orig = np.concatenate(leg_orig) if leg_orig else np.empty(0, dtype=np.int64)
+    leg_dest = np.concatenate(leg_dest) if leg_dest else np.empty(0, dtype=np.int64)
+    
+    # 先查路段快取，只有未計算過的路段才需要計算最短路徑
+    memo_path = memo if isinstance(memo, str) else None
+    if not isinstance(memo, PathMemo):
+        memo = PathMemo(path=memo_path)
+    memo.check_graph(_graph_fingerprint(G))
+    
+    index = get_graph_index(G)
+    nodes = index['nodes']
+    leg_paths = [None] * n_legs  # 各路段的路徑節點位置
+    converted = {}  # 本次呼叫中已由節點 ID 轉為節點位置的快取路徑
+    pending = {}  # 未命中的路段 key -> 使用該路段的 leg 位置
+    for leg, (start, end) in enumerate(zip(leg_orig, leg_dest)):
+        if start < 0 or end < 0:
+            continue
+        key = (nodes[start], nodes[end], weight)
+        if key in pending:
+            memo.hits += 1
+            pending[key].append(leg)
+        elif key in memo:
+            path = memo.get(key)
+            if path is not None and key not in converted:
+                positions = _node_positions(G, path)
+                if (positions < 0).any():
+                    # 快取路徑含有目前路網沒有的節點，視為未命中並重新計算
+                    memo.hits -= 1
+                    memo.misses += 1
+                    pending[key] = [leg]
+                    continue
+                converted[key] = positions
+            leg_paths[leg] = converted.get(key)
+        else:
+            memo.misses += 1
+            pending[key] = [leg]
+    
+    timing = None
+    if pending:
+        first_legs = np.array([legs[0] for legs in pending.values()])
+        _, new_paths, timing = _route_pairs(G, leg_orig[first_legs], leg_dest[first_legs], weight=weight, workers=workers)
+        for (key, legs), path in zip(pending.items(), new_paths):
+            memo.put(key, tuple(nodes[path]) if path is not None else None)
+            for leg in legs:
+                leg_paths[leg] = path
+    
+    if memo_path:
+        memo.save()
+    
+    routes = []
+    for route_id, (first, last) in zip(route_ids, route_legs):
+        route_lines = leg_paths[first:last]
+        if any(path is None for path in route_lines):
+            print(f"無法計算路線：{route_id} 有站點之間沒有可到達的路徑")
+            routes.append(None)
+            continue
         
-        # 把每個路段連接起來
-        full_route_coords = [coord for line in route_lines for coord in line]
+        # 把每個路段連接起來，後一段的起點即前一段的終點，不重複加入
+        full_route_nodes = np.concatenate([route_lines[0]] + [line[1:] for line in route_lines[1:]]) \
+                           if route_lines else np.empty(0, dtype=np.int64)
         
         # 創建一個 LineString 對象，表示完整的路徑
-        route_line = LineString(full_route_coords)
-        routes.append(route_line)
-        route_ids.append(route_id)  # 記錄該路線的 RouteID
+        try:
+            routes.append(LineString(np.column_stack([index['x'][full_route_nodes], index['y'][full_route_nodes]])))
+        except Exception as e:
+            print(f"無法計算路線：{e}")
+            routes.append(None)
     
     # 創建 GeoDataFrame
     gdf = gpd.GeoDataFrame({
         idcolumns: route_ids,  # 每條路線的 RouteID
         'geometry': routes
     }, crs="EPSG:4326")
+    if timing is not None:
+        gdf.attrs['worker_timing'] = timing
+    gdf.attrs['memo_info'] = memo.info()
     
     return gdf
 
-def decode_polyline(encoded):
+def _decode_polyline_arrays(encoded, precision=5):
+    """
+    一次解碼多個 Google Polyline 字串，不需額外套件。
+
+    Returns:
+        tuple: (所有點位的 (經度, 緯度) 座標陣列、每個點位所屬字串的位置陣列、每個字串的點位數陣列)
+    """
+    strings = [text if isinstance(text, str) else '' for text in encoded]
+    lengths = np.fromiter((len(text) for text in strings), dtype=np.int64, count=len(strings))
+    buffer = np.frombuffer(''.join(strings).encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if len(buffer) == 0:
+        return np.empty((0, 2)), np.empty(0, dtype=np.int64), np.zeros(len(strings), dtype=np.int64)
+
+    # 每個數值由數個 5 bit 字元組成，0x20 表示後面還有字元；每個字串的最後一個字元一定是數值結尾
+    is_last = (buffer & 0x20) == 0
+    is_last[np.cumsum(lengths)[lengths > 0] - 1] = True
+    value_start = np.flatnonzero(np.r_[True, is_last[:-1]])
+    value_id = np.cumsum(is_last) - is_last
+    shift = (np.arange(len(buffer)) - value_start[value_id]) * 5
+    values = np.add.reduceat((buffer & 0x1f) << shift, value_start)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # 同一字串中的數值依序為 緯度、經度 的差值
+    string_id = np.repeat(np.arange(len(strings)), lengths)[value_start]
+    value_count = np.bincount(string_id, minlength=len(strings))
+    rank = np.arange(len(values)) - (np.cumsum(value_count) - value_count)[string_id]
+    point_count = value_count // 2
+    keep = rank < 2 * point_count[string_id]
+    values, rank, string_id = values[keep], rank[keep], string_id[keep]
+
+    lat_delta, lng_delta = values[rank % 2 == 0], values[rank % 2 == 1]
+    point_string = string_id[rank % 2 == 0]
+
+    # 差值累加還原座標，並扣除前面字串的累計值
+    point_start = np.cumsum(point_count) - point_count
+    lat = np.cumsum(lat_delta)
+    lng = np.cumsum(lng_delta)
+    lat -= np.r_[0, lat][point_start][point_string]
+    lng -= np.r_[0, lng][point_start][point_string]
+
+    coords = np.column_stack([lng, lat]) / 10**precision
+    return coords, point_string, point_count
+
+def decode_polyline_series(encoded, precision=5):
+    """
+    將整欄 Google Polyline 字串一次解碼為 LineString (經度, 緯度)。
+
+    Args:
+        encoded (Series or list of str): Polyline 字串。
+        precision (int, optional): 編碼精度，Google 預設為 5 (座標乘以 1e5)。
+
+    Returns:
+        GeoSeries: WGS84 的 LineString，空值或少於兩個點的字串為 None。
+    """
+    import geopandas as gpd
+    import shapely
+    index = encoded.index if isinstance(encoded, pd.Series) else None
+    coords, point_string, point_count = _decode_polyline_arrays(encoded, precision=precision)
+
+    # 一次建立所有 LineString，點位不足兩點的字串維持 None
+    lines = np.full(len(point_count), None, dtype=object)
+    valid = point_count[point_string] >= 2
+    if valid.any():
+        shapely.linestrings(coords[valid], indices=point_string[valid], out=lines)
+    return gpd.GeoSeries(lines, index=index, crs='EPSG:4326')
+
+def encode_polyline(geometries, precision=5):
+    """
+    將 LineString (經度, 緯度) 一次編碼為 Google Polyline 字串，可與 decode_polyline_series 互相轉換。
+
+    Args:
+        geometries (GeoSeries or list of LineString): 要編碼的線。
+        precision (int, optional): 編碼精度，Google 預設為 5 (座標乘以 1e5)。
+
+    Returns:
+        Series: Polyline 字串，空值為 None。
+    """
+    import shapely
+    index = geometries.index if isinstance(geometries, pd.Series) else None
+    geoms = np.asarray(geometries, dtype=object)
+    coords, line_id = shapely.get_coordinates(geoms, return_index=True)
+
+    # 每條線第一個點保留原值，之後為與前一點的差值，依 緯度、經度 交錯排列
+    scaled = np.round(coords[:, ::-1] * 10**precision).astype(np.int64)
+    deltas = scaled.copy()
+    deltas[1:] -= scaled[:-1]
+    first = np.r_[True, line_id[1:] != line_id[:-1]][:len(line_id)] # 沒有任何座標時為空陣列
+    deltas[first] = scaled[first]
+    values = deltas.ravel()
+    value_line = np.repeat(line_id, 2)
+
+    # 每個數值左移一位 (負數取補數) 後，切成 5 bit 一組，除了最後一組都加上 0x20
+    values = np.where(values < 0, ~(values << 1), values << 1)
+    k = np.arange(7)
+    parts = (values[:, None] >> (5 * k)) & 0x1f
+    n_chunks = np.maximum(((values[:, None] >> (5 * k)) > 0).sum(axis=1), 1)
+    chars = (parts | np.where(k < (n_chunks - 1)[:, None], 0x20, 0)) + 63
+    text = chars[k < n_chunks[:, None]].astype(np.uint8).tobytes().decode('ascii')
+
+    line_length = np.bincount(value_line, weights=n_chunks, minlength=len(geoms)).astype(np.int64)
+    offsets = np.r_[0, np.cumsum(line_length)]
+    encoded = [text[offsets[i]:offsets[i + 1]] for i in range(len(geoms))]
+    encoded = [None if shapely.is_missing(geom) else line for geom, line in zip(geoms, encoded)]
+    return pd.Series(encoded, index=index, dtype=object)
+
+def decode_polyline(encoded, precision=5):
     """解碼 Google Polyline 為 LineString"""
-    points = polyline.decode(encoded)  # 取得座標點列表 [(lat, lon), (lat, lon), ...]
-    return LineString([(lon, lat) for lat, lon in points])  # 轉換為 LineString（經度, 緯度）
+    return decode_polyline_series([encoded], precision=precision).iloc[0]
@@ -1,13 +1,17 @@
 import pandas as pd
 import os 
 import shutil
-import openpyxl
+import time
+import sqlite3
+import hashlib
+import itertools
+import unicodedata
 import numpy as np
 from pathlib import Path
 from datetime import datetime, timedelta
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment
-from openpyxl.utils import get_column_letter, column_index_from_string
+
+# 檔案清單索引 (FileManifest) 的預設存放資料夾，放在本機避免被雲端硬碟同步
+MANIFEST_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.cache', 'THI-ProcessTool', 'manifest')
 
 # 1. 資料夾路徑相關
 
@@ -28,27 +32,260 @@ def delete_folders(deletelist):
         else:
             print(f"資料夾 '{folder_name}' 不存在。")
 
-def find_folder(folderpath, find_by):
+def find_folder(folderpath, find_by, manifest=None):
     """
     在指定的資料夾中尋找名稱包含特定字串的資料夾。
     Args:
         folderpath (str): 要搜尋的根目錄。
         find_by (str): 要匹配的字串，資料夾名稱中需包含此字串。
+        manifest (bool, str or FileManifest, optional): 是否使用檔案清單索引，只重新掃描有變動的資料夾。
+                                                        True 使用預設索引檔，str 為索引檔路徑，也可傳入已建立的 FileManifest (回傳絕對路徑)。
     Returns:
         list: 符合條件的資料夾完整路徑清單。
     """
+    if manifest:
+        index = _open_manifest(folderpath, manifest)
+        try:
+            index.refresh()
+            return index.query_folders(contains=find_by, folder=folderpath)
+        finally:
+            if index is not manifest:
+                index.close()
+
     matching_folders = []
-    
-    for root, dirs, _ in os.walk(folderpath):
+    for root, dirs in _walk_folders(folderpath):
         for d in dirs:
             if find_by in d:
                 matching_folders.append(os.path.join(root, d))
     return matching_folders
 
+def _walk_folders(folderpath):
+    """以 os.scandir 由上而下走訪資料夾，回傳 (資料夾, 子資料夾名稱 list)，順序與 os.walk 相同"""
+    stack = [folderpath]
+    while stack:
+        root = stack.pop()
+        try:
+            with os.scandir(root) as entries:
+                dirs = [entry.name for entry in entries if _is_folder(entry)]
+        except OSError:
+            continue
+        yield root, dirs
+        stack.extend(os.path.join(root, d) for d in reversed(dirs))
+
+def _is_folder(entry):
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return False
+
+def scan_files(folderpath, suffix=None, recursive=True):
+    """
+    以 os.scandir 走訪資料夾，邊走訪邊依副檔名篩選，不需先建立完整的檔案清單。
+
+    Args:
+        folderpath (str): 指定的檔案路徑。
+        suffix (str or tuple, optional): 檔名結尾，例如 '.csv' 或 ('.csv', '.xlsx')，預設為 None (所有檔案)。
+        recursive (bool, optional): 是否檢索所有子資料夾，預設為 True。
+
+    Yields:
+        str: 符合條件的檔案路徑，順序與 os.walk 相同。
+    """
+    stack = [folderpath]
+    while stack:
+        root = stack.pop()
+        dirs = []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if _is_folder(entry):
+                        dirs.append(entry.path)
+                    elif (suffix is None or entry.name.endswith(suffix)) and entry.is_file():
+                        yield entry.path
+        except OSError:
+            continue
+        if recursive:
+            stack.extend(reversed(dirs))
+
+class FileManifest:
+    """
+    資料夾的檔案清單索引，以 SQLite 記錄每個檔案的路徑、大小與修改時間。
+    refresh 時只重新列出修改時間有變動的資料夾 (資料夾內有新增、刪除或更名時才會變動)，
+    其餘資料夾直接沿用索引，適合檔案數量龐大或位於雲端同步資料夾的專案。
+
+    注意：直接覆寫既有檔案不會改變資料夾的修改時間，該檔案的大小與修改時間需以 refresh(full=True) 更新。
+
+    Args:
+        folderpath (str): 建立索引的根目錄。
+        dbpath (str, optional): 索引檔路徑，預設存於 MANIFEST_CACHE_FOLDER，檔名依根目錄路徑產生。
+    """
+
+    def __init__(self, folderpath, dbpath=None):
+        self.root = os.path.abspath(folderpath)
+        if dbpath is None:
+            key = hashlib.md5(os.path.normcase(self.root).encode('utf-8')).hexdigest()
+            dbpath = os.path.join(MANIFEST_CACHE_FOLDER, f'{key}.sqlite')
+        os.makedirs(os.path.dirname(os.path.abspath(dbpath)), exist_ok=True)
+        self.dbpath = dbpath
+        self.conn = sqlite3.connect(dbpath)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY, parent TEXT, name TEXT, mtime INTEGER);
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, folder TEXT, name TEXT, size INTEGER, mtime INTEGER);
+            CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+        """)
+        self.scanned = 0
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """關閉索引檔"""
+        self.conn.close()
+
+    def refresh(self, full=False):
+        """
+        更新索引，只重新列出修改時間有變動的資料夾。
+
+        Args:
+            full (bool, optional): 是否重新列出所有資料夾，預設為 False。
+
+        Returns:
+            int: 本次重新列出的資料夾數量。
+        """
+        known = dict(self.conn.execute('SELECT path, mtime FROM folders'))
+        children = {}
+        for parent, path in self.conn.execute('SELECT parent, path FROM folders'):
+            children.setdefault(parent, []).append(path)
+
+        seen = set()
+        self.scanned = 0
+        stack = [self.root]
+        while stack:
+            folder = stack.pop()
+            try:
+                mtime = os.stat(folder).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(folder)
+
+            # 資料夾沒有變動：子資料夾沿用索引，仍需逐一檢查其修改時間
+            if not full and known.get(folder) == mtime:
+                stack.extend(children.get(folder, []))
+                continue
+
+            files = []
+            dirs = []
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                dirs.append(entry.path)
+                            elif entry.is_file():
+                                stat = entry.stat()
+                                files.append((entry.path, folder, entry.name, stat.st_size, stat.st_mtime_ns))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+            self.scanned += 1
+            self.conn.execute('DELETE FROM files WHERE folder = ?', (folder,))
+            self.conn.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', files)
+            self.conn.execute('INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?)',
+                              (folder, os.path.dirname(folder), os.path.basename(folder), mtime))
+            stack.extend(dirs)
+
+        # 已不存在的資料夾從索引中移除
+        removed = [(path,) for path in known if path not in seen]
+        self.conn.executemany('DELETE FROM files WHERE folder = ?', removed)
+        self.conn.executemany('DELETE FROM folders WHERE path = ?', removed)
+        self.conn.commit()
+        return self.scanned
+
+    def _where(self, pattern, suffix, contains, folder, recursive, column):
+        where = []
+        params = []
+        if folder is not None:
+            folder = os.path.abspath(folder)
+            if recursive:
+                prefix = os.path.join(folder, '')
+                where.append(f'({column} = ? OR substr({column}, 1, ?) = ?)')
+                params += [folder, len(prefix), prefix]
+            else:
+                where.append(f'{column} = ?')
+                params.append(folder)
+        if pattern is not None:
+            where.append('name GLOB ?')
+            params.append(pattern)
+        if suffix is not None:
+            suffixes = [suffix] if isinstance(suffix, str) else list(suffix)
+            where.append('(' + ' OR '.join('substr(name, -?) = ?' for _ in suffixes) + ')')
+            for item in suffixes:
+                params += [len(item), item]
+        if contains is not None:
+            where.append('instr(name, ?) > 0')
+            params.append(contains)
+        return (' WHERE ' + ' AND '.join(where)) if where else '', params
+
+    def query(self, pattern=None, suffix=None, contains=None, folder=None, recursive=True, stat=False):
+        """
+        從索引查詢檔案，條件皆以檔名 (不含資料夾) 判斷，多個條件同時成立才會回傳。
+
+        Args:
+            pattern (str, optional): 檔名的萬用字元，例如 '2024*.csv' (區分大小寫)。
+            suffix (str or tuple, optional): 檔名結尾，例如 '.csv'。
+            contains (str, optional): 檔名需包含的字串。
+            folder (str, optional): 只查詢此資料夾下的檔案，預設為整個根目錄。
+            recursive (bool, optional): 是否包含 folder 的子資料夾，預設為 True。
+            stat (bool, optional): 是否回傳含大小與修改時間的 DataFrame，預設為 False (回傳路徑 list)。
+
+        Returns:
+            list or DataFrame: 檔案路徑 list；stat=True 時為含 Path、Size、Mtime 欄位的 DataFrame。
+        """
+        where, params = self._where(pattern, suffix, contains, folder, recursive, 'folder')
+        if stat:
+            df = pd.read_sql_query(f'SELECT path AS Path, size AS Size, mtime AS Mtime FROM files{where} ORDER BY path',
+                                   self.conn, params=params)
+            df['Mtime'] = pd.to_datetime(df['Mtime'], unit='ns')
+            return df
+        return [row[0] for row in self.conn.execute(f'SELECT path FROM files{where} ORDER BY path', params)]
+
+    def query_folders(self, pattern=None, contains=None, folder=None):
+        """
+        從索引查詢資料夾 (不含 folder 本身)，條件以資料夾名稱判斷。
+
+        Args:
+            pattern (str, optional): 資料夾名稱的萬用字元。
+            contains (str, optional): 資料夾名稱需包含的字串。
+            folder (str, optional): 只查詢此資料夾下的資料夾，預設為整個根目錄。
+
+        Returns:
+            list: 資料夾路徑 list。
+        """
+        where, params = self._where(pattern, None, contains, folder or self.root, True, 'parent')
+        return [row[0] for row in self.conn.execute(f'SELECT path FROM folders{where} ORDER BY path', params)]
+
+    def info(self):
+        """回傳索引的檔案數、資料夾數與上次 refresh 重新列出的資料夾數"""
+        folders = self.conn.execute('SELECT COUNT(*) FROM folders').fetchone()[0]
+        return {'files': len(self), 'folders': folders, 'scanned': self.scanned, 'dbpath': self.dbpath}
+
+def _open_manifest(folderpath, manifest):
+    """將 findfiles / find_folder 的 manifest 參數轉為 FileManifest"""
+    if isinstance(manifest, FileManifest):
+        return manifest
+    return FileManifest(folderpath, dbpath=manifest if isinstance(manifest, str) else None)
+
 def check_pathexist(path):
     return os.path.exists(path)
 
-def findfiles(filefolderpath, filetype='.csv', recursive=True):
+def findfiles(filefolderpath, filetype='.csv', recursive=True, manifest=None):
     """
     尋找指定路徑下指定類型的檔案，並返回檔案路徑列表。
 
@@ -56,27 +293,22 @@ def findfiles(filefolderpath, filetype='.csv', recursive=True):
         filefolderpath (str): 指定的檔案路徑。
         filetype (str, optional): 要尋找的檔案類型，預設為 '.csv'。
         recursive (bool, optional): 是否檢索所有子資料夾，預設為 True；反之為False，僅查找當前資料夾的所有file。
+        manifest (bool, str or FileManifest, optional): 是否使用檔案清單索引，只重新掃描有變動的資料夾。
+                                                        True 使用預設索引檔，str 為索引檔路徑，也可傳入已建立的 FileManifest (回傳絕對路徑)。
 
     Returns:
         list: 包含所有符合條件的檔案路徑的列表。
     """
-    filelist = []
-
-    if recursive:
-        # 遍歷資料夾及其子資料夾
-        for root, _, files in os.walk(filefolderpath):
-            for file in files:
-                if file.endswith(filetype):
-                    file_path = os.path.join(root, file)
-                    filelist.append(file_path)
-    else:
-        # 僅檢索當前資料夾
-        for file in os.listdir(filefolderpath):
-            file_path = os.path.join(filefolderpath, file)
-            if os.path.isfile(file_path) and file.endswith(filetype):
-                filelist.append(file_path)
+    if manifest:
+        index = _open_manifest(filefolderpath, manifest)
+        try:
+            index.refresh()
+            return index.query(suffix=filetype, folder=filefolderpath, recursive=recursive)
+        finally:
+            if index is not manifest:
+                index.close()
 
-    return filelist
+    return list(scan_files(filefolderpath, suffix=filetype, recursive=recursive))
 
 def get_filename(path, extension=False):
     """
@@ -207,27 +439,84 @@ def get_filename_withoutprojectname(path, step = 0):
 
 # 2. Excel 資料處理相關
 
-def read_combined_dataframe(file_list):
+def _read_dataframe(file, usecols=None, dtype=None, engine=None):
+    """
+    依副檔名讀取單一檔案，供 read_combined_dataframe 在執行緒或子程序中呼叫。
+    回傳 (DataFrame, 錯誤訊息)，讀取失敗時 DataFrame 為 None。
+    """
+    name = str(file).lower()
+    try:
+        if name.endswith(('.csv', '.csv.gz', '.txt')):
+            df = pd.read_csv(file, usecols=usecols, dtype=dtype, engine=engine)
+        elif name.endswith('.parquet'):
+            df = pd.read_parquet(file, columns=usecols)
+        elif name.endswith(('.shp', '.gpkg', '.geojson')):
+            import geopandas as gpd
+            df = gpd.read_file(file)
+            if usecols is not None:
+                df = df[[column for column in df.columns if column in usecols or column == df.geometry.name]]
+        elif name.endswith(('.xls', '.xlsx')):
+            df = pd.read_excel(file, usecols=usecols, dtype=dtype)
+        else:
+            return None, f"Unsupported file format: {file}"
+    except Exception as e:
+        return None, f"Error reading {file}: {e}"
+
+    # 非 csv / excel 的格式沒有 dtype 參數，讀完後再統一型態
+    if dtype is not None and not name.endswith(('.csv', '.csv.gz', '.txt', '.xls', '.xlsx')):
+        schema = dtype if isinstance(dtype, dict) else {column: dtype for column in df.columns if column != 'geometry'}
+        df = df.astype({column: t for column, t in schema.items() if column in df.columns})
+    return df, None
+
+def read_combined_dataframe(file_list, usecols=None, dtype=None, engine=None, workers=None, use_process=False, source_column=None):
+    """
+    讀取多個檔案並合併為單一 DataFrame，檔案以執行緒 (或子程序) 平行讀取，最後只合併一次。
+
+    Args:
+        file_list (list): 檔案路徑列表，支援 csv (含 .csv.gz、.txt)、parquet、shp/gpkg/geojson、xls/xlsx。
+        usecols (list, optional): 只讀取的欄位，所有檔案共用。
+        dtype (dict or type, optional): 共用的欄位型態，例如 {'Date': str, 'Count': 'int32'}，
+                                        提供後各檔案不需再各自推測型態，合併時也不會因型態不一致而轉型。
+        engine (str, optional): csv 的解析引擎，'pyarrow' 可使用多執行緒解析大型 csv，預設為 pandas 的 'c'。
+        workers (int, optional): 同時讀取的檔案數量，預設為 None (由 concurrent.futures 決定)，1 為依序讀取。
+        use_process (bool, optional): 是否改用子程序平行讀取，適合大量小檔案且解析為主要瓶頸時，預設為 False (執行緒)。
+        source_column (str, optional): 來源檔案路徑的欄位名稱，有提供時新增此欄位 (category 型態)。
+
+    Returns:
+        DataFrame: 合併後的資料；若有 shp 等空間資料則為 GeoDataFrame。
+    """
+    file_list = list(file_list)
+
+    if workers == 1 or len(file_list) <= 1:
+        results = [_read_dataframe(file, usecols, dtype, engine) for file in file_list]
+    else:
+        from functools import partial
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        pool = ProcessPoolExecutor if use_process else ThreadPoolExecutor
+        with pool(max_workers=workers) as executor:
+            results = list(executor.map(partial(_read_dataframe, usecols=usecols, dtype=dtype, engine=engine), file_list))
+
     dataframes = []
-    
-    for file in file_list:
-        try:
-            if file.endswith('.csv'):
-                df = pd.read_csv(file)
-            elif file.endswith('.shp'):
-                df = gpd.read_file(file)
-            elif file.endswith(('.xls', '.xlsx')):
-                df = pd.read_excel(file)
-            else:
-                print(f"Unsupported file format: {file}")
-                continue
-                
-            dataframes.append(df)
-        except Exception as e:
-            print(f"Error reading {file}: {e}")
+    sources = []
+    for file, (df, message) in zip(file_list, results):
+        if message is not None:
+            print(message)
+            continue
+        dataframes.append(df)
+        sources.append(file)
+
+    if not dataframes:
+        print("沒有可以合併的檔案")
+        return pd.DataFrame()
 
     # 合併所有 DataFrame
     combined_df = pd.concat(dataframes, ignore_index=True)
+
+    # 來源檔案以 category 儲存，每列只需一個整數代碼，不必在合併前逐一複製每個檔案
+    if source_column:
+        file_codes, categories = pd.factorize(pd.Series(sources, dtype=object))
+        codes = np.repeat(file_codes, [len(df) for df in dataframes])
+        combined_df[source_column] = pd.Categorical.from_codes(codes, categories=categories)
     return combined_df
 
 def move_column(df, column_name, insert_index):
@@ -270,6 +559,361 @@ def get_excel_sheet_names(path):
         print(f"發生錯誤：{e}")
         return []
 
+def _parse_cell(cell):
+    """將儲存格位置 (如 'AB12') 轉為 (列, 欄) 的數字索引"""
+    from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+    col_letter, row = coordinate_from_string(cell.upper())
+    return row, column_index_from_string(col_letter)
+
+def _dataframe_rows(df, chunksize=10000, na_to_none=False, inf_rep=None):
+    """
+    逐段將 DataFrame 轉為 Python 原生型態的列，不需一次建立整張表的 object 陣列。
+    na_to_none=True 時空值 (NaN、NaT) 轉為 None，寫入 Excel 時為空白儲存格。
+    inf_rep 有設定時正、負無限大轉為 inf_rep、'-' + inf_rep 字串 (同 pandas to_excel 的 inf_rep)。
+    """
+    for start in range(0, len(df), chunksize):
+        block = df.iloc[start:start + chunksize]
+        columns = []
+        for i in range(block.shape[1]):
+            column = block.iloc[:, i]
+            if inf_rep is not None and column.dtype.kind in 'fO':
+                inf = column.isin([np.inf, -np.inf])
+                if inf.any():
+                    column = column.astype(object)
+                    column[inf] = np.where(column[inf] > 0, inf_rep, '-' + inf_rep)
+            if na_to_none and column.hasnans:
+                column = column.astype(object).where(column.notna(), None)
+            columns.append(column.tolist())
+        yield from zip(*columns)
+
+def _display_width(text):
+    """文字的顯示寬度，中日韓等全形字元算 2 個字元寬"""
+    return sum(2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1 for ch in text)
+
+def _column_display_width(values):
+    """
+    計算一欄資料的最大顯示寬度，空值不計。
+    純 ASCII 的值直接以字串長度計算，只有含全形字元的值才逐字判斷寬度。
+    """
+    text = pd.Series(values, dtype=object).dropna().astype(str)
+    if text.empty:
+        return 0
+    lengths = text.str.len()
+    wide = text.str.contains(r'[^\x00-\x7f]')
+    if wide.any():
+        lengths[wide] = text[wide].map(_display_width)
+    return int(lengths.max())
+
+class ExcelSession:
+    """
+    只開啟一次 Excel 的工作階段，可連續進行多次寫入、清除、貼上、合併與格式調整，結束時才存檔一次。
+    大型範本需填入大量儲存格時，可避免每個步驟都重新讀取與儲存整份檔案。
+
+    使用方式:
+        with ExcelSession('報表.xlsx') as book:
+            book.write('總表', 'B2', 100)
+            book.clean_and_paste('明細', df, 'A1')
+
+    離開 with 時，有修改才會存檔；區塊內發生例外則不存檔，原檔案維持不變。
+
+    Args:
+        excelpath (str): Excel 檔案路徑。
+        savepath (str, optional): 存檔路徑，預設為 None (覆蓋 excelpath)。
+    """
+
+    def __init__(self, excelpath, savepath=None):
+        import openpyxl
+        self.excelpath = excelpath
+        self.savepath = savepath or excelpath
+        self.wb = openpyxl.load_workbook(excelpath)
+        self.modified = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self.modified:
+            self.save()
+        self.close()
+
+    @property
+    def sheetnames(self):
+        return self.wb.sheetnames
+
+    def save(self, path=None):
+        """存檔，預設存到 savepath"""
+        self.wb.save(path or self.savepath)
+        self.modified = False
+
+    def close(self):
+        """關閉活頁簿 (不存檔)"""
+        self.wb.close()
+
+    def duplicate_sheet(self, originalsheet, duplicatesheet, verbose=False):
+        """建立工作頁副本，參數同 duplicate_excel_sheet"""
+        # 確認原始工作表是否存在
+        if originalsheet not in self.wb.sheetnames:
+            print(f"工作表 {originalsheet} 不存在！")
+            return
+
+        # 複製原始工作表並設定副本工作表名稱
+        copied_sheet = self.wb.copy_worksheet(self.wb[originalsheet])
+        copied_sheet.title = duplicatesheet
+        self.modified = True
+        if verbose:
+            print(f"工作表 {originalsheet} 已成功複製為 {duplicatesheet}！")
+
+    def clean_data(self, sheet_name, start_col='B', start_row=2, axis='range', end_col=None, end_row=None, verbose=False):
+        """清除指定範圍的資料與公式，參數同 clean_excel_data"""
+        from openpyxl.utils import column_index_from_string
+        sheet = self.wb[sheet_name]
+
+        # 將欄位轉換成索引
+        start_col_index = column_index_from_string(start_col)
+        end_col_index = column_index_from_string(end_col) if end_col else start_col_index
+
+        # 清除資料與公式
+        if axis == 'row':  # 清除整列
+            for col in range(1, sheet.max_column + 1):
+                sheet.cell(row=start_row, column=col).value = None
+        elif axis == 'col':  # 清除整欄
+            for row in range(1, sheet.max_row + 1):
+                sheet.cell(row=row, column=start_col_index).value = None
+        elif axis == 'range':  # 清除指定範圍
+            end_row = end_row if end_row else sheet.max_row
+            for row in range(start_row, end_row + 1):
+                for col in range(start_col_index, end_col_index + 1):
+                    sheet.cell(row=row, column=col).value = None
+        else:
+            raise ValueError("axis 必須是 'row', 'col', 或 'range'")
+        self.modified = True
+
+        if verbose:
+            print(f"已清除 {sheet_name} 的 {start_col}{start_row} 到 {end_col or start_col}{end_row or sheet.max_row} 範圍的資料與公式！")
+
+    def write(self, sheetname, cell, value, verbose=False):
+        """在指定儲存格填入數值，參數同 write_to_excel"""
+        # 確保目標工作表存在
+        if sheetname not in self.wb.sheetnames:
+            print(f"⚠️ 錯誤：工作表 '{sheetname}' 不存在！")
+            return
+
+        self.wb[sheetname][cell] = value  # 填入值
+        self.modified = True
+        if verbose:
+            print(f"✅ 在 '{sheetname}' 的 {cell} 填入 '{value}'")
+
+    def write_dataframe(self, sheet_name, df, startcell='A1', title=True, verbose=False):
+        """
+        將 df 從 startcell 開始整批寫入工作表。
+        目標範圍下方沒有任何資料時以 ws.append 逐列串流寫入；
+        否則以 iter_rows 一次取得整個範圍的儲存格後依序填值，範圍外的儲存格與公式不受影響。
+
+        Args:
+            sheet_name (str): 工作表名稱。
+            df (DataFrame): 要寫入的資料。
+            startcell (str, optional): 起始儲存格，例如 'A1'、'AB12'。
+            title (bool, optional): 是否寫入欄位名稱，預設為 True。
+            verbose (bool, optional): 是否印出寫入速度。
+
+        Returns:
+            dict: 'cells' 為寫入的儲存格數，'seconds' 為耗時，'cells_per_second' 為每秒寫入的儲存格數。
+        """
+        ws = self.wb[sheet_name]
+        start_row, start_col = _parse_cell(startcell)
+        nrows = len(df) + (1 if title else 0)
+        ncols = df.shape[1]
+
+        start = time.perf_counter()
+        rows = _dataframe_rows(df)
+        if start_row > ws._current_row:
+            # ws.append 由目前最後一列的下一列開始寫，先補上空白列與左側空白欄
+            for _ in range(start_row - 1 - ws._current_row):
+                ws.append([])
+            pad = [None] * (start_col - 1)
+            if title:
+                ws.append(pad + list(df.columns))
+            for row in rows:
+                ws.append(pad + list(row))
+        elif nrows and ncols:
+            if title:
+                rows = itertools.chain([tuple(df.columns)], rows)
+            cells = ws.iter_rows(min_row=start_row, max_row=start_row + nrows - 1,
+                                 min_col=start_col, max_col=start_col + ncols - 1)
+            for cell_row, row in zip(cells, rows):
+                for cell, value in zip(cell_row, row):
+                    cell.value = value
+        self.modified = True
+
+        seconds = time.perf_counter() - start
+        stats = {'cells': nrows * ncols, 'seconds': seconds,
+                 'cells_per_second': nrows * ncols / seconds if seconds > 0 else float('inf')}
+        if verbose:
+            print(f"寫入 {stats['cells']:,} 格，耗時 {seconds:.2f} 秒 ({stats['cells_per_second']:,.0f} 格/秒)")
+        return stats
+
+    def clean_and_paste(self, sheet_name, df, startcell, title=True, verbose=False):
+        """清空工作表並將 df 從 startcell 開始寫入，參數同 clean_and_paste"""
+        if sheet_name not in self.wb.sheetnames:
+            print(f"工作表 '{sheet_name}' 不存在！")
+            return
+
+        ws = self.wb[sheet_name]
+
+        # 清空工作表 (移除所有內容)，清空後可直接以 ws.append 串流寫入
+        ws.delete_rows(1, ws.max_row)
+        stats = self.write_dataframe(sheet_name, df, startcell, title=title, verbose=verbose)
+
+        if verbose:
+            print(f"資料已寫入 {sheet_name}，起始位置：{startcell} (標題: {title})")
+        return stats
+
+    def add_sheet(self, df, sheet_name="Sheet1", startcell="A1", title=False, verbose=False):
+        """新增工作表並將 df 從 startcell 開始寫入，參數同 excel_addnewsheet"""
+        self.wb.create_sheet(title=sheet_name)
+        return self.write_dataframe(sheet_name, df, startcell, title=title, verbose=verbose)
+
+    def paste_data(self, sheet_name, data, start_col='B', start_row=2):
+        """將資料貼到指定欄位，保留其他公式，參數同 paste_data_to_excel"""
+        from openpyxl.utils import column_index_from_string
+        sheet = self.wb[sheet_name]
+
+        # 將起始欄字母轉換為索引
+        col_index = column_index_from_string(start_col)
+
+        # 貼資料到指定欄
+        for i, value in enumerate(data, start=start_row):
+            sheet.cell(row=i, column=col_index, value=value)
+        self.modified = True
+
+    def reformat(self, sheetname=None, allsheet=False, selectfont="微軟正黑體", fontsize=12, df=None, sample_rows=1000):
+        """
+        自動調整列寬並設置字體格式，參數同 reformat_excel。
+
+        欄寬由 df (或工作表前 sample_rows 列的取樣) 計算，全形字元以 2 個字元寬計算，不需逐格讀取整張表。
+        字體只建立一個 Font，所有儲存格共用同一個樣式代碼，並設為各欄的預設樣式 (之後新增的儲存格也會套用)。
+        """
+        from copy import copy
+        from openpyxl.styles import Font
+        from openpyxl.styles.cell_style import StyleArray
+        from openpyxl.utils import get_column_letter
+
+        # 根據是否選擇了特定工作表或處理所有工作表進行處理
+        sheets_to_process = self.wb.sheetnames if allsheet else [sheetname] if sheetname else []
+
+        if not sheets_to_process:
+            # 如果沒有指定工作表名稱並且allsheet為False，則處理所有工作表
+            sheets_to_process = self.wb.sheetnames
+
+        # 整份活頁簿共用一個字體，字體只加入樣式表一次
+        font = Font(name=selectfont, size=fontsize)
+        font_id = self.wb._fonts.add(font)
+
+        for sheet in sheets_to_process:
+            ws = self.wb[sheet]
+            source = df.get(sheet) if isinstance(df, dict) else df
+
+            # 自動調整列寬：有 df 時以 df 的標題與內容計算，否則取樣工作表前 sample_rows 列
+            if source is not None:
+                widths = [max(_display_width(str(column)), _column_display_width(source.iloc[:, i]))
+                          for i, column in enumerate(source.columns)]
+            else:
+                rows = list(ws.iter_rows(max_row=min(ws.max_row, sample_rows) if sample_rows else None, values_only=True))
+                widths = [_column_display_width(values) for values in zip(*rows)]
+
+            # 計算並設置列寬，整欄空白時維持原本欄寬
+            widths = {get_column_letter(col_idx): (max_length + 2) * 1.3
+                      for col_idx, max_length in enumerate(widths, start=1) if max_length > 0}
+            for column, width in widths.items():
+                ws.column_dimensions[column].width = width
+
+            # 設置字體：每種樣式只計算一次替換後的樣式，只改字體、保留數值格式與框線等設定
+            # (新建立、尚未設定樣式的儲存格 _style 為 None，即預設樣式)
+            # openpyxl 之後設定樣式時會直接修改 cell._style，每個儲存格需各自持有一份樣式陣列
+            replaced = {}
+            for cell in ws._cells.values():
+                style = replaced.get(cell._style)
+                if style is None:
+                    style = StyleArray() if cell._style is None else copy(cell._style)
+                    style.fontId = font_id
+                    replaced[cell._style] = style
+                cell._style = StyleArray(style)
+
+            # 各欄預設樣式，空白儲存格之後輸入資料時也是相同字體
+            # (只設定有調整欄寬的欄，建立欄設定會同時固定欄寬)
+            for column in widths:
+                ws.column_dimensions[column].font = font
+        self.modified = True
+
+    def merge_column_data(self, sheet_name, columns, start_row=2, hierarchical=False):
+        """
+        合併指定欄位中相鄰且內容相同的儲存格，參數同 merge_column_data。
+        各欄只讀取一次，以 NumPy 找出連續相同值的區段後再一次合併。
+        回傳是否找到工作表。
+        """
+        from openpyxl.styles import Alignment
+        from openpyxl.utils import get_column_letter
+        from openpyxl.worksheet.merge import MergedCellRange
+
+        # 確保 sheet 存在
+        if sheet_name not in self.wb.sheetnames:
+            print(f"錯誤：找不到工作表 '{sheet_name}'")
+            return False
+
+        sheet = self.wb[sheet_name]
+
+        # 獲取總行數
+        max_row = sheet.max_row
+
+        # 只讀取一次標題列，找到各欄位的索引 (欄位名稱重複時取第一個)
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        positions = {}
+        for i, value in enumerate(header, start=1):
+            positions.setdefault(value, i)
+
+        col_indexes = []
+        for col in columns:
+            if col not in positions:
+                print(f"找不到欄位 {col}")
+                continue
+            col_indexes.append(positions[col])
+
+        self.modified = True
+        n = max_row - start_row + 1
+        if not col_indexes or n <= 0:
+            return True
+
+        # 一次讀取所有目標欄位的資料
+        min_col, max_col = min(col_indexes), max(col_indexes)
+        rows = sheet.iter_rows(min_row=start_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True)
+        block = np.empty((n, max_col - min_col + 1), dtype=object)
+        block[:] = list(rows)
+
+        # sheet.merge_cells 每次都會與所有已合併的範圍逐一比對，合併數量多時會變成平方成長；
+        # 這裡算出的區段彼此不重疊，只需與原本已存在的合併範圍比對，再直接加入合併清單
+        existing = list(sheet.merged_cells.ranges)
+        alignment = Alignment(horizontal="center", vertical="center")
+        boundary = np.zeros(n, dtype=bool)
+        for col_index in col_indexes:
+            values = block[:, col_index - min_col]
+            letter = get_column_letter(col_index)
+
+            # 與上一列不同的位置為新區段的起點；hierarchical 時上層欄位的區段起點也一併切開
+            change = np.ones(n, dtype=bool)
+            change[1:] = values[1:] != values[:-1]
+            boundary = boundary | change if hierarchical else change
+
+            starts = np.flatnonzero(boundary)
+            ends = np.append(starts[1:], n)
+            runs = ends - starts > 1
+            for start, end in zip((starts[runs] + start_row).tolist(), (ends[runs] + start_row - 1).tolist()):
+                merged = MergedCellRange(sheet, f'{letter}{start}:{letter}{end}')
+                if not any(merged <= other for other in existing):
+                    sheet.merged_cells.ranges.add(merged)
+                sheet._clean_merge_range(merged)
+                sheet.cell(row=start, column=col_index).alignment = alignment
+        return True
+
 def duplicate_excel_sheet(excelpath, originalsheet, duplicatesheet, verbose = False):
     """
     建立excel工作頁副本。
@@ -280,29 +924,10 @@ def duplicate_excel_sheet(excelpath, originalsheet, duplicatesheet, verbose = Fa
         duplicatesheet(str): 副本工作頁名稱。
         verbose(Boolean): 是否印出文字。
 
-    Returns:
-        DataFrame: 包含新插入的 Percent 欄位的資料框。
+    多個步驟連續修改同一份檔案時，建議改用 ExcelSession 只開啟、存檔一次。
     """
-    # 載入 Excel 文件
-    wb = openpyxl.load_workbook(excelpath)
-    
-    # 確認原始工作表是否存在
-    if originalsheet not in wb.sheetnames:
-        print(f"工作表 {originalsheet} 不存在！")
-        return
-    
-    # 取得原始工作表
-    original = wb[originalsheet]
-    
-    # 複製原始工作表
-    copied_sheet = wb.copy_worksheet(original)
-    copied_sheet.title = duplicatesheet  # 設定副本工作表名稱
-    
-    # 儲存文件
-    wb.save(excelpath)
-    wb.close()
-    if verbose:
-        print(f"工作表 {originalsheet} 已成功複製為 {duplicatesheet}！")
+    with ExcelSession(excelpath) as book:
+        book.duplicate_sheet(originalsheet, duplicatesheet, verbose=verbose)
 
 def clean_excel_data(file_path, sheet_name, start_col='B', start_row=2, axis='range', end_col=None, end_row=None, verbose=False):
     """
@@ -318,36 +943,15 @@ def clean_excel_data(file_path, sheet_name, start_col='B', start_row=2, axis='ra
         end_row (int): 清除資料的結束列 (如 10)，僅在 axis='range' 時有效。
         verbose (bool): 是否印出清除範圍的訊息 (預設 False)。
     """
-    # 打開 Excel 檔案
-    wb = openpyxl.load_workbook(file_path)
-    sheet = wb[sheet_name]
-
-    # 將欄位轉換成索引
-    start_col_index = openpyxl.utils.column_index_from_string(start_col)
-    end_col_index = openpyxl.utils.column_index_from_string(end_col) if end_col else start_col_index
-
-    # 清除資料與公式
-    if axis == 'row':  # 清除整列
-        for col in range(1, sheet.max_column + 1):
-            sheet.cell(row=start_row, column=col).value = None
-    elif axis == 'col':  # 清除整欄
-        for row in range(1, sheet.max_row + 1):
-            sheet.cell(row=row, column=start_col_index).value = None
-    elif axis == 'range':  # 清除指定範圍
-        end_row = end_row if end_row else sheet.max_row
-        for row in range(start_row, end_row + 1):
-            for col in range(start_col_index, end_col_index + 1):
-                sheet.cell(row=row, column=col).value = None
-    else:
-        raise ValueError("axis 必須是 'row', 'col', 或 'range'")
-
-    # 儲存檔案
-    wb.save(file_path)
+    with ExcelSession(file_path) as book:
+        book.clean_data(sheet_name, start_col=start_col, start_row=start_row, axis=axis,
+                        end_col=end_col, end_row=end_row, verbose=verbose)
 
-    if verbose:
-        print(f"已清除 {sheet_name} 的 {start_col}{start_row} 到 {end_col or start_col}{end_row or sheet.max_row} 範圍的資料與公式！")
+# Excel 單一工作表的列數上限 (含標題列)
+EXCEL_MAX_ROWS = 1048576
 
-def save_to_excel_multiplesheet(dflists, folder, filename, sheetnamelist):
+def save_to_excel_multiplesheet(dflists, folder, filename, sheetnamelist, streaming=False, split_sheets=False,
+                                max_rows=EXCEL_MAX_ROWS):
     """
     將多個 DataFrame 儲存為同一個 Excel 檔案的多個工作表（sheet）
 
@@ -355,6 +959,7 @@ def save_to_excel_multiplesheet(dflists, folder, filename, sheetnamelist):
     ----------
     dflists : list of pandas.DataFrame
         一個包含多個 DataFrame 的 list，每個 DataFrame 將存為一個工作表。
+        每個元素也可以是 DataFrame 的 list 或 iterator (例如 pd.read_csv(..., chunksize=...))，依序寫入同一個工作表。
     
     folder : str
         要儲存 Excel 檔案的資料夾路徑。如果資料夾不存在，會自動建立。
@@ -365,6 +970,17 @@ def save_to_excel_multiplesheet(dflists, folder, filename, sheetnamelist):
     sheetnamelist : list of str
         一個包含每個工作表名稱的 list，順序需與 dflists 相對應。
 
+    streaming : bool, optional
+        是否使用串流模式，預設為 False。串流模式以 xlsxwriter 的 constant_memory 逐列寫入，
+        每個工作表寫完即寫出暫存檔，記憶體只需容納一個 chunk，適合百萬列等級的資料。
+
+    split_sheets : bool, optional
+        資料超過 max_rows 時是否自動拆成多個工作表 (名稱加上 _2、_3…，每個工作表都有標題列)，
+        預設為 False (超過時拋出 ValueError)。
+
+    max_rows : int, optional
+        每個工作表的列數上限 (含標題列)，預設為 Excel 上限 1,048,576。
+
     注意:
     ----------
     - dflists 和 sheetnamelist 的長度必須相同。
@@ -380,13 +996,97 @@ def save_to_excel_multiplesheet(dflists, folder, filename, sheetnamelist):
     if len(dflists) != len(sheetnamelist):
         raise ValueError("dflists 和 sheetnamelist 長度不一致")
 
-    # 寫入 Excel
-    with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
-        for df, sheet_name in zip(dflists, sheetnamelist):
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    # 建立檔案前先檢查已知列數的工作表是否超過上限，避免寫到一半才失敗
+    for df, sheet_name in zip(dflists, sheetnamelist):
+        if isinstance(df, pd.DataFrame):
+            _split_sheet_rows(len(df), sheet_name, split_sheets, max_rows)
+
+    if streaming:
+        _save_excel_streaming(dflists, filepath, sheetnamelist, split_sheets, max_rows)
+    else:
+        # 寫入 Excel
+        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
+            for df, sheet_name in zip(dflists, sheetnamelist):
+                if not isinstance(df, pd.DataFrame):
+                    # 沒有任何 chunk 時與串流模式相同，輸出空白工作表
+                    chunks = list(df)
+                    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+                parts = _split_sheet_rows(len(df), sheet_name, split_sheets, max_rows)
+                for part_name, start, end in parts:
+                    df.iloc[start:end].to_excel(writer, sheet_name=part_name, index=False)
     
     print(f"成功儲存到 {filepath}")
 
+def _split_sheet_name(sheet_name, part):
+    """第 part 個拆分工作表的名稱，第一個維持原名，其餘加上 _2、_3… 並符合 31 字元的限制"""
+    if part == 1:
+        return sheet_name
+    suffix = f'_{part}'
+    return sheet_name[:31 - len(suffix)] + suffix
+
+def _split_sheet_rows(nrows, sheet_name, split_sheets, max_rows):
+    """回傳 [(工作表名稱, 起始列, 結束列)]，資料列數超過 max_rows - 1 時依 split_sheets 拆分或拋出錯誤"""
+    per_sheet = max_rows - 1
+    if nrows <= per_sheet:
+        return [(sheet_name, 0, nrows)]
+    if not split_sheets:
+        raise ValueError(f"工作表 '{sheet_name}' 有 {nrows} 列資料，超過上限 {per_sheet} 列，可設定 split_sheets=True 自動拆分")
+    return [(_split_sheet_name(sheet_name, i // per_sheet + 1), i, min(i + per_sheet, nrows))
+            for i in range(0, nrows, per_sheet)]
+
+def _save_excel_streaming(dflists, filepath, sheetnamelist, split_sheets, max_rows):
+    """
+    以 xlsxwriter 的 constant_memory 模式逐列寫入，每個工作表可由多個 DataFrame chunk 組成。
+    先寫入暫存檔，全部成功才取代 filepath，中途失敗不會留下寫到一半的檔案。
+    """
+    import xlsxwriter
+
+    temp_path = filepath + '.tmp'
+    workbook = xlsxwriter.Workbook(temp_path, {'constant_memory': True,
+                                              'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+                                              'remove_timezone': True})
+    # 與 pandas to_excel 相同的標題格式
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    per_sheet = max_rows - 1
+
+    completed = False
+    try:
+        for chunks, sheet_name in zip(dflists, sheetnamelist):
+            if isinstance(chunks, pd.DataFrame):
+                chunks = [chunks]
+
+            worksheet = None
+            columns = None
+            part = 0
+            row_idx = per_sheet
+            for chunk in chunks:
+                if columns is None:
+                    columns = list(chunk.columns)
+                for row in _dataframe_rows(chunk, na_to_none=True, inf_rep='inf'):
+                    # 目前工作表已滿 (或尚未建立) 時開新工作表並寫入標題列
+                    if row_idx >= per_sheet:
+                        if part and not split_sheets:
+                            raise ValueError(f"工作表 '{sheet_name}' 超過上限 {per_sheet} 列，可設定 split_sheets=True 自動拆分")
+                        part += 1
+                        worksheet = workbook.add_worksheet(_split_sheet_name(sheet_name, part))
+                        worksheet.write_row(0, 0, columns, header_format)
+                        row_idx = 0
+                    row_idx += 1
+                    worksheet.write_row(row_idx, 0, row)
+
+            # 沒有任何資料列時仍建立只有標題列的工作表
+            if worksheet is None:
+                worksheet = workbook.add_worksheet(sheet_name)
+                if columns is not None:
+                    worksheet.write_row(0, 0, columns, header_format)
+        completed = True
+    finally:
+        workbook.close()
+        if completed:
+            os.replace(temp_path, filepath)
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
+
 def write_to_excel(excelpath, sheetname, cell, value, verbose = False):
     """
     在指定 Excel 工作表的指定儲存格填入數值。
@@ -401,22 +1101,8 @@ def write_to_excel(excelpath, sheetname, cell, value, verbose = False):
     Returns:
         None
     """
-    wb = openpyxl.load_workbook(excelpath)
-    
-    # 確保目標工作表存在
-    if sheetname not in wb.sheetnames:
-        print(f"⚠️ 錯誤：工作表 '{sheetname}' 不存在！")
-        wb.close()
-        return
-
-    ws = wb[sheetname]
-    ws[cell] = value  # 填入值
-    
-    # 儲存並關閉
-    wb.save(excelpath)
-    wb.close()
-    if verbose:
-        print(f"✅ 在 '{sheetname}' 的 {cell} 填入 '{value}'")
+    with ExcelSession(excelpath) as book:
+        book.write(sheetname, cell, value, verbose=verbose)
 
 def clean_and_paste(excelpath, sheet_name, df, startcell, title=True, verbose = False):
     """
@@ -430,39 +1116,8 @@ def clean_and_paste(excelpath, sheet_name, df, startcell, title=True, verbose =
     - title (bool): 是否寫入欄位名稱 (預設 True)
     - verbose(Bool) : 是的話則會印出完成指定字串。
     """
-    # 讀取 Excel
-    wb = load_workbook(excelpath)
-
-    if sheet_name not in wb.sheetnames:
-        print(f"工作表 '{sheet_name}' 不存在！")
-        return
-    
-    ws = wb[sheet_name]
-
-    # 清空工作表 (移除所有內容)
-    ws.delete_rows(1, ws.max_row)
-
-    # 解析 startcell (A1 轉換成 row=1, col=1)
-    col_letter = ''.join(filter(str.isalpha, startcell))  # 提取字母部分 (欄)
-    row_number = int(''.join(filter(str.isdigit, startcell)))  # 提取數字部分 (列)
-    start_col = column_index_from_string(col_letter)  # 轉換 A → 1, B → 2
-
-    # 如果 title=True，先寫入欄位名稱
-    if title:
-        for c_idx, col_name in enumerate(df.columns, start=start_col):
-            ws.cell(row=row_number, column=c_idx, value=col_name)
-        row_number += 1  # 資料從下一列開始
-
-    # 使用 openpyxl 方式將 DataFrame 寫入 (避免影響其他工作表)
-    for r_idx, row in enumerate(df.to_numpy(), start=row_number):
-        for c_idx, value in enumerate(row, start=start_col):
-            ws.cell(row=r_idx, column=c_idx, value=value)
-    
-    # 儲存 Excel
-    wb.save(excelpath)
-    wb.close()
-    if verbose:
-        print(f"資料已寫入 {sheet_name}，起始位置：{startcell} (標題: {title})")
+    with ExcelSession(excelpath) as book:
+        book.clean_and_paste(sheet_name, df, startcell, title=title, verbose=verbose)
 
 def paste_data_to_excel(file_path, sheet_name, data, start_col='B', start_row=2):
     """
@@ -475,19 +1130,8 @@ def paste_data_to_excel(file_path, sheet_name, data, start_col='B', start_row=2)
         start_col (str): 貼上資料的起始欄 (如 'B')。
         start_row (int): 貼上資料的起始列 (預設從第 2 列開始)。
     """
-    # 打開 Excel 檔案
-    wb = openpyxl.load_workbook(file_path)
-    sheet = wb[sheet_name]
-
-    # 將起始欄字母轉換為索引
-    col_index = openpyxl.utils.column_index_from_string(start_col)
-
-    # 貼資料到指定欄
-    for i, value in enumerate(data, start=start_row):
-        sheet.cell(row=i, column=col_index, value=value)
-
-    # 儲存檔案
-    wb.save(file_path)
+    with ExcelSession(file_path) as book:
+        book.paste_data(sheet_name, data, start_col=start_col, start_row=start_row)
 
 def find_last_cell(excelpath, sheet_name=None):
     '''
@@ -497,6 +1141,8 @@ def find_last_cell(excelpath, sheet_name=None):
         excelpath (str): Excel 檔案路徑。
         sheet_name (str, optional): 工作表名稱，沒有填寫的話會讀取第一個分頁。
     '''
+    import openpyxl
+    from openpyxl.utils import get_column_letter
     # 開啟 Excel 檔案
     workbook = openpyxl.load_workbook(excelpath, data_only=True)
     
@@ -519,7 +1165,7 @@ def find_last_cell(excelpath, sheet_name=None):
     workbook.close()
     return last_row, last_column_letter
 
-def reformat_excel(excel_path, sheetname=None, allsheet=False, selectfont="微軟正黑體", fontsize=12):
+def reformat_excel(excel_path, sheetname=None, allsheet=False, selectfont="微軟正黑體", fontsize=12, df=None, sample_rows=1000):
     """自動調整列寬並設置字體格式
     Args:
         excel_path (str): 檔案的完整路徑。
@@ -527,44 +1173,15 @@ def reformat_excel(excel_path, sheetname=None, allsheet=False, selectfont="微
         allsheet (bool, optional): 若要進行全部的工作業調整，請更改為True。
         selectfont (str) : 字體。
         fontsize (int) : 字體大小。
+        df (DataFrame or dict, optional): 寫入工作表的原始資料 (自 A1 起、含標題列)，有提供時直接以 df 計算欄寬；
+                                          多個工作表可傳入 {工作表名稱: DataFrame}。
+        sample_rows (int, optional): 沒有 df 時，以工作表前幾列計算欄寬，預設為 1000，None 為全部列。
     """
-    # 載入 Excel 文件
-    wb = load_workbook(excel_path)
-
-    # 根據是否選擇了特定工作表或處理所有工作表進行處理
-    sheets_to_process = wb.sheetnames if allsheet else [sheetname] if sheetname else []
-
-    if not sheets_to_process:
-        # 如果沒有指定工作表名稱並且allsheet為False，則處理所有工作表
-        sheets_to_process = wb.sheetnames
-
-    for sheet in sheets_to_process:
-        ws = wb[sheet]
-
-        # 自動調整列寬
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter  # 獲取列的字母名稱
-            for cell in col:
-                try:
-                    # 避免空白格錯誤，並計算最長文字長度
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass  # 如果 cell 是空的，跳過
-            # 計算並設置列寬
-            adjusted_width = (max_length + 2) * 1.3
-            ws.column_dimensions[column].width = adjusted_width
-
-        # 設置字體
-        for row in ws.iter_rows():
-            for cell in row:
-                cell.font = Font(name=selectfont, size=fontsize)
+    with ExcelSession(excel_path) as book:
+        book.reformat(sheetname=sheetname, allsheet=allsheet, selectfont=selectfont, fontsize=fontsize,
+                      df=df, sample_rows=sample_rows)
 
-    # 儲存 Excel 文件
-    wb.save(excel_path)
-
-def merge_column_data(excel_path, sheet_name, columns, start_row=2, replace=True):
+def merge_column_data(excel_path, sheet_name, columns, start_row=2, replace=True, hierarchical=False):
     """
     合併 Excel 指定欄位中相鄰且內容相同的儲存格，並進行跨欄置中對齊。
 
@@ -574,75 +1191,34 @@ def merge_column_data(excel_path, sheet_name, columns, start_row=2, replace=True
     - columns (list): 要合併的欄位名稱列表
     - start_row (int): 從哪一行開始合併（預設為 2）
     - replace (bool): 是否覆蓋原始檔案 (True=覆蓋, False=另存新檔)
+    - hierarchical (bool): 是否依 columns 順序分層合併，下層欄位只在上層欄位的合併範圍內合併 (預設 False，各欄獨立合併)
     """
-    
-    # 讀取 Excel
-    wb = openpyxl.load_workbook(excel_path)
-    
-    # 確保 sheet 存在
-    if sheet_name not in wb.sheetnames:
-        print(f"錯誤：找不到工作表 '{sheet_name}'")
-        return
-
-    sheet = wb[sheet_name]
-
-    # 獲取總行數
-    max_row = sheet.max_row
-
-    for col in columns:
-        col_index = None
-        # 找到對應欄位的索引
-        for i, cell in enumerate(sheet[1], start=1):
-            if cell.value == col:
-                col_index = i
-                break
-        
-        if col_index is None:
-            print(f"找不到欄位 {col}")
-            continue
+    # 另存新檔時原檔案不會被修改
+    new_excel_path = excel_path if replace else excel_path.replace(".xlsx", "_merged.xlsx")
+    with ExcelSession(excel_path, savepath=new_excel_path) as book:
+        merged = book.merge_column_data(sheet_name, columns, start_row=start_row, hierarchical=hierarchical)
 
-        # 開始合併相同內容的儲存格
-        merge_start = start_row  # 設定合併起點
-        for row in range(start_row + 1, max_row + 2):  # 從 start_row+1 行開始比對
-            current_value = sheet.cell(row=merge_start, column=col_index).value
-            next_value = sheet.cell(row=row, column=col_index).value
-
-            if current_value != next_value or row > max_row:
-                if row - merge_start > 1:
-                    sheet.merge_cells(start_row=merge_start, start_column=col_index, 
-                                      end_row=row-1, end_column=col_index)
-                    merged_cell = sheet.cell(row=merge_start, column=col_index)
-                    merged_cell.alignment = Alignment(horizontal="center", vertical="center")
-                
-                merge_start = row  # 更新起始行數
-
-    # 儲存 Excel 檔案
+    if not merged:
+        return
     if replace:
-        wb.save(excel_path)
         print(f"合併完成，原檔案已覆蓋：{excel_path}")
     else:
-        new_excel_path = excel_path.replace(".xlsx", "_merged.xlsx")
-        wb.save(new_excel_path)
         print(f"合併完成，已另存為：{new_excel_path}")
 
-def excel_addnewsheet(excelpath, df, sheet_name="Sheet1", startcell="A1"):
-    # Load the existing Excel file
-    wb = load_workbook(excelpath)
-
-    # Create a new sheet
-    ws = wb.create_sheet(title=sheet_name)
-
-    # Convert the start cell to row and column indices
-    start_row = int(startcell[1:])
-    start_col = ord(startcell[0].upper()) - ord('A') + 1
-
-    # Write DataFrame to the sheet starting at the specified cell
-    for row_idx, row in df.iterrows():
-        for col_idx, value in enumerate(row, start=start_col):
-            ws.cell(row=row_idx + start_row - 1, column=col_idx, value=value)
+def excel_addnewsheet(excelpath, df, sheet_name="Sheet1", startcell="A1", title=False, verbose=False):
+    """
+    在 Excel 新增工作表，並將 df 從 startcell 開始寫入。
 
-    # Save the workbook after adding the new sheet
-    wb.save(excelpath)
+    Args:
+        excelpath (str): Excel 檔案路徑。
+        df (DataFrame): 要寫入的資料。
+        sheet_name (str, optional): 新工作表名稱。
+        startcell (str, optional): 起始儲存格，例如 'A1'、'AB12'。
+        title (bool, optional): 是否寫入欄位名稱，預設為 False (只寫入資料)。
+        verbose (bool, optional): 是否印出寫入速度。
+    """
+    with ExcelSession(excelpath) as book:
+        book.add_sheet(df, sheet_name=sheet_name, startcell=startcell, title=title, verbose=verbose)
 
 def read_specific_data(excelfilepath, sheetname, cell):
     """
@@ -656,6 +1232,7 @@ def read_specific_data(excelfilepath, sheetname, cell):
     Returns:
         value: 儲存格中的資料（任何類型）
     """
+    from openpyxl import load_workbook
     wb = load_workbook(excelfilepath, data_only=True)
     ws = wb[sheetname]
     return ws[cell].value
@@ -907,6 +1484,7 @@ def seperate_mergecolumns(excelpath, sheetname=None, replace=True):
         sheetname (str, optional): 工作頁，如果沒有填的話則是處理第一個工作頁。
         replace (Boolean, optional) : 是否覆蓋，反之為另存。 
     """
+    import openpyxl
     # 開啟 Excel 檔案
     wb = openpyxl.load_workbook(excelpath)
     
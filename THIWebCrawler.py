@@ -1,16 +1,18 @@
 import pandas as pd
 import re
 import random
+import time
 from datetime import datetime 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 
 def googlemap_crawler(placelist, searchcolumns = 'POIName', starturl = "https://www.google.com.tw/maps/@22.3912397,120.2980826,10z?hl=zh-TW&entry=ttu"):
+    # selenium 僅在實際爬蟲時載入，避免 import 本模組就拖慢啟動
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from webdriver_manager.chrome import ChromeDriverManager
+
     df = placelist.copy()
 
     # 打開瀏覽器
@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import subprocess
+
+# 各模組 import 的時間預算 (秒)，為扣除 pandas、numpy 基本載入時間後的額外耗時
+IMPORT_BUDGET = {
+    'ProcessBasic': 0.15,
+    'GISshape': 0.15,
+    'THIWebCrawler': 0.15,
+}
+
+# import 模組時不應被載入的重量級套件 (需在函數被呼叫時才載入)
+HEAVY_MODULES = ['geopandas', 'shapely', 'osmnx', 'networkx', 'scipy', 'openpyxl', 'selenium', 'webdriver_manager']
+
+# 在全新的 Python 程序中量測，避免已載入的套件影響結果
+_MEASURE_CODE = '''
+import sys, time, json
+start = time.perf_counter()
+import pandas, numpy
+base = time.perf_counter()
+{statement}
+end = time.perf_counter()
+print(json.dumps({{'base': base - start, 'module': end - base, 'loaded': sorted(set(m.split('.')[0] for m in sys.modules))}}))
+'''
+
+def measure_import(module, repeat=5, folder=None):
+    """
+    在獨立的子程序中量測 import 模組的時間。
+
+    Args:
+        module (str): 模組名稱。
+        repeat (int): 重複量測次數，取最小值以降低系統負載的影響。
+        folder (str, optional): 模組所在資料夾，預設為本檔案所在資料夾。
+
+    Returns:
+        dict: 'seconds' 為 import 模組的額外耗時 (秒)，'heavy' 為被一併載入的重量級套件。
+    """
+    folder = folder or os.path.dirname(os.path.abspath(__file__))
+    code = _MEASURE_CODE.format(statement=f'import {module}')
+    seconds = []
+    loaded = set()
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', code], cwd=folder, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f'import {module} 失敗：\n{result.stderr}')
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+        seconds.append(output['module'])
+        loaded.update(output['loaded'])
+    return {'seconds': min(seconds), 'heavy': [m for m in HEAVY_MODULES if m in loaded]}
+
+def check_import_budget(budget=None, repeat=5, folder=None):
+    """
+    檢查各模組 import 時間是否超出預算，並確認沒有提前載入重量級套件。
+
+    Args:
+        budget (dict, optional): 模組名稱與時間預算 (秒)，預設為 IMPORT_BUDGET。
+        repeat (int): 每個模組重複量測次數。
+        folder (str, optional): 模組所在資料夾。
+
+    Returns:
+        DataFrame: 每個模組的 import 時間、預算、載入的重量級套件與是否通過。
+    """
+    import pandas as pd
+    budget = budget or IMPORT_BUDGET
+    rows = []
+    for module, limit in budget.items():
+        result = measure_import(module, repeat=repeat, folder=folder)
+        rows.append({
+            'Module': module,
+            'Seconds': round(result['seconds'], 4),
+            'Budget': limit,
+            'Heavy': ', '.join(result['heavy']),
+            'Pass': result['seconds'] <= limit and not result['heavy'],
+        })
+    return pd.DataFrame(rows)
+
+if __name__ == '__main__':
+    report = check_import_budget()
+    print(report.to_string(index=False))
+    if not report['Pass'].all():
+        print('import 時間超出預算或提前載入了重量級套件')
+        sys.exit(1)